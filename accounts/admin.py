@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, UserProfile
+from .models import ImageJob, OutboxEmail, User, UserProfile
 
 
 class CustomUserAdmin(UserAdmin):
@@ -37,3 +37,21 @@ class CustomUserAdmin(UserAdmin):
 
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(UserProfile)
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'sent_at')
+
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
+
+
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'field', 'status', 'attempts', 'next_attempt_at', 'processed_at')
+    list_filter = ('status', 'model')
+    readonly_fields = ('created_at', 'processed_at')
+
+
+admin.site.register(ImageJob, ImageJobAdmin)
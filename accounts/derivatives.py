@@ -0,0 +1,56 @@
+# Resized copies of uploaded images. The files are written by the
+# accounts.images worker next to the original; which ones exist is kept in
+# a JSON field beside each image field:
+#
+#     {'source': 'foodimages/soup.jpg',
+#      'thumb': 'foodimages/soup.3f2a9c0d41be.thumb.jpg',
+#      'thumb_webp': 'foodimages/soup.8e1d07b2c5aa.thumb.webp', ...}
+
+# longest side, in pixels, of each derivative
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1280,
+}
+
+
+class ImageVariants:
+    """
+    URLs of the derivatives of ``image`` for templates.
+
+    Until the worker has processed the current upload (or when
+    ``derivatives`` were made from an earlier one) every URL is the
+    original's and the WebP URLs are empty.
+    """
+
+    def __init__(self, image, derivatives):
+        self.image = image
+        self.derivatives = derivatives if image and (derivatives or {}).get('source') == image.name else {}
+
+    def __bool__(self):
+        return bool(self.image)
+
+    @property
+    def url(self):
+        return self.image.url if self.image else ''
+
+    def variant_url(self, variant):
+        name = self.derivatives.get(variant)
+        if name:
+            return self.image.storage.url(name)
+        return '' if variant.endswith('_webp') else self.url
+
+    @property
+    def thumb_url(self):
+        return self.variant_url('thumb')
+
+    @property
+    def thumb_webp_url(self):
+        return self.variant_url('thumb_webp')
+
+    @property
+    def medium_url(self):
+        return self.variant_url('medium')
+
+    @property
+    def medium_webp_url(self):
+        return self.variant_url('medium_webp')
@@ -0,0 +1,215 @@
+import hashlib
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .derivatives import VARIANT_SIZES
+from .models import ImageJob
+from .outbox import CLAIM_LEASE, MAX_ATTEMPTS, claim_due, retry_delay
+from .utils import fields_changed
+
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# sent with the saved instance once new derivatives are stored; they are
+# written with update(), so post_save receivers never see them
+derivatives_ready = Signal()
+
+# (model, field name) of every image field registered with track_image_field
+tracked_image_fields = []
+
+
+def derivatives_field(field):
+    return f'{field}_derivatives'
+
+
+def _image_name(instance, field):
+    # read through __dict__ so deferred fields never trigger a query
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value) or ''
+
+
+def track_image_field(model, field):
+    """
+    Queue an ImageJob whenever ``model`` is saved with a new image in
+    ``field``. The model needs a ``<field>_derivatives`` JSONField.
+    """
+    flag = f'_{field}_changed'
+    uid = f'{model._meta.label_lower}.{field}'
+
+    def remember_image_change(sender, instance, update_fields=None, **kwargs):
+        # profiles are re-saved on every user update, so only a new upload
+        # should cost a resize
+        instance.__dict__[flag] = bool(_image_name(instance, field)) and fields_changed(
+            instance, (field,), update_fields,
+        )
+
+    def image_changed_receiver(sender, instance, **kwargs):
+        if instance.__dict__.pop(flag, False):
+            queue_image_jobs([instance], field)
+
+    pre_save.connect(remember_image_change, sender=model, weak=False, dispatch_uid=f'remember_image:{uid}')
+    post_save.connect(image_changed_receiver, sender=model, weak=False, dispatch_uid=f'image_changed:{uid}')
+    tracked_image_fields.append((model, field))
+
+
+def _queue_jobs(label, pks, field):
+    # re-arms the job if one already exists for this image field
+    return ImageJob.objects.bulk_create(
+        [ImageJob(model=label, object_id=pk, field=field) for pk in pks],
+        update_conflicts=True,
+        unique_fields=['model', 'object_id', 'field'],
+        update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'],
+    )
+
+
+def queue_image_jobs(instances, field):
+    # Saved in the caller's transaction, like queue_email.
+    if instances:
+        _queue_jobs(instances[0]._meta.label_lower, [instance.pk for instance in instances], field)
+
+
+def queue_missing_image_jobs(chunk_size=500):
+    """Queue jobs for every tracked image without current derivatives. Returns how many."""
+    queued = 0
+    for model, field in tracked_image_fields:
+        rows = (
+            model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .order_by('pk').values_list('pk', field, derivatives_field(field))
+        )
+        stale = []
+        for pk, name, derivatives in rows.iterator(chunk_size=chunk_size):
+            if (derivatives or {}).get('source') != name:
+                stale.append(pk)
+            if len(stale) == chunk_size:
+                _queue_jobs(model._meta.label_lower, stale, field)
+                queued += len(stale)
+                stale = []
+        if stale:
+            _queue_jobs(model._meta.label_lower, stale, field)
+            queued += len(stale)
+    return queued
+
+
+def _encode(image, format):
+    buffer = io.BytesIO()
+    if format == 'JPEG':
+        image.save(buffer, format, quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif format == 'WEBP':
+        image.save(buffer, format, quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, format, optimize=True)
+    return buffer.getvalue()
+
+
+def _save_derivative(storage, stem, variant, ext, data):
+    # named by content, so a retried or repeated resize reuses the file
+    name = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}.{variant}.{ext}'
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return name
+
+
+def resize_image(image):
+    """
+    Write the VARIANT_SIZES derivatives of the stored ``image`` next to it,
+    each in the original's family (JPEG, or PNG if it has transparency) and
+    as WebP. Returns ``{variant: name}``.
+    """
+    with image.storage.open(image.name, 'rb') as f:
+        original = Image.open(f)
+        # lets the JPEG decoder skip detail the largest variant won't keep
+        largest = max(VARIANT_SIZES.values())
+        original.draft('RGB', (largest, largest))
+        original.load()
+    original = ImageOps.exif_transpose(original)
+    has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+    format, ext = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+    stem = os.path.splitext(image.name)[0]
+
+    names = {}
+    for variant, size in VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        resized = resized.convert('RGBA' if has_alpha else 'RGB')
+        names[variant] = _save_derivative(image.storage, stem, variant, ext, _encode(resized, format))
+        names[f'{variant}_webp'] = _save_derivative(image.storage, stem, variant, 'webp', _encode(resized, 'WEBP'))
+    return names
+
+
+def make_derivatives(job):
+    model = apps.get_model(job.model)
+    instance = model._default_manager.filter(pk=job.object_id).first()
+    if instance is None:
+        return
+    image = getattr(instance, job.field)
+    if not image or (getattr(instance, derivatives_field(job.field)) or {}).get('source') == image.name:
+        return
+    derivatives = {'source': image.name, **resize_image(image)}
+    # only if the image wasn't replaced meanwhile; a new upload has re-armed
+    # this job and is resized on the next run
+    updated = model._default_manager.filter(pk=instance.pk, **{job.field: image.name}).update(
+        **{derivatives_field(job.field): derivatives}
+    )
+    if updated:
+        setattr(instance, derivatives_field(job.field), derivatives)
+        transaction.on_commit(lambda: derivatives_ready.send(sender=model, instance=instance, field=job.field))
+
+
+def process_image_jobs(batch_size=20, max_attempts=MAX_ATTEMPTS):
+    """
+    Make the derivatives for one batch of due image jobs.
+
+    The batch is claimed in a short transaction and resized outside it, so
+    an upload re-arming one of its jobs never waits on a resize. Each job is
+    marked as soon as it is done. Failed jobs are retried with the outbox's
+    backoff and given up on after ``max_attempts``; files that are not images
+    fail straight away. Returns the number of jobs done.
+    """
+    now = timezone.now()
+    claimed_until = now + CLAIM_LEASE
+    done = 0
+    for job in claim_due(ImageJob.objects.all(), batch_size, now, lease=CLAIM_LEASE):
+        try:
+            with transaction.atomic():
+                make_derivatives(job)
+        except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.warning('Image job %s can not be processed: %s', job, e)
+            _failed(job, claimed_until, e, now, max_attempts=job.attempts + 1)
+        except Exception as e:
+            logger.warning('Image job %s failed: %s', job, e)
+            _failed(job, claimed_until, e, now, max_attempts)
+        else:
+            done += _finish(
+                job, claimed_until,
+                status=ImageJob.DONE, attempts=job.attempts + 1, processed_at=timezone.now(), last_error='',
+            )
+    return done
+
+
+def _finish(job, claimed_until, **fields):
+    # a new upload re-arms the job while it is being resized; that run has to
+    # stay pending, so only a job still under this claim is marked
+    return ImageJob.objects.filter(pk=job.pk, next_attempt_at=claimed_until).update(**fields)
+
+
+def _failed(job, claimed_until, error, now, max_attempts):
+    attempts = job.attempts + 1
+    if attempts >= max_attempts:
+        _finish(job, claimed_until, status=ImageJob.FAILED, attempts=attempts, last_error=str(error))
+    else:
+        _finish(
+            job, claimed_until,
+            attempts=attempts, last_error=str(error), next_attempt_at=now + retry_delay(attempts),
+        )
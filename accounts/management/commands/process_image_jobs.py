@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.images import process_image_jobs, queue_missing_image_jobs
+from accounts.outbox import MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = 'Make resized copies of uploaded images. With --loop, keep polling for new uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--backfill', action='store_true', help='First queue every image that has no current copies.')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for new jobs.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when there are no jobs.')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f'Queued {queue_missing_image_jobs()} images.')
+        total = 0
+        while True:
+            done = process_image_jobs(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            total += done
+            if done:
+                self.stdout.write(f'Resized {done} images.')
+            if done < options['batch_size']:
+                # queue drained (or only failing jobs left)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Resized {total} images in total.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import MAX_ATTEMPTS, send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send the emails waiting in the outbox. With --loop, keep polling for new ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll the outbox.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            sent = send_queued_emails(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            total += sent
+            if sent:
+                self.stdout.write(f'Sent {sent} emails.')
+            if sent < options['batch_size']:
+                # outbox drained (or only failing emails left)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total} emails in total.'))
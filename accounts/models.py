@@ -1,7 +1,10 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager 
 from django.db.models.fields.related import ForeignKey, OneToOneField
 
+from .derivatives import ImageVariants
+
 
 # from django.contrib.gis.db import models as gismodels
 # from django.contrib.gis.geos import Point
@@ -93,6 +96,9 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE ,default=1)  # remove blank=True, null=True
     profile_picture = models.ImageField(upload_to='users/profile_pictures', blank=True, null=True)
     cover_photo = models.ImageField(upload_to='users/cover_photos', blank=True, null=True)
+    # resized copies written by accounts.images, see the *_variants properties
+    profile_picture_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    cover_photo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     address = models.CharField(max_length=250, blank=True, null=True)
     country = models.CharField(max_length=15, blank=True, null=True)
     devision = models.CharField(max_length=15, blank=True, null=True)
@@ -110,6 +116,14 @@ class UserProfile(models.Model):
     def __str__(self):
         return self.user.email
 
+    @property
+    def profile_picture_variants(self):
+        return ImageVariants(self.profile_picture, self.profile_picture_derivatives)
+
+    @property
+    def cover_photo_variants(self):
+        return ImageVariants(self.cover_photo, self.cover_photo_derivatives)
+
 
     # def save(self, *args, **kwargs):
     #     if self.latitude and self.longitude:
@@ -118,7 +132,68 @@ class UserProfile(models.Model):
     #     return super(UserProfile, self).save(*args, **kwargs)
 
 
+class OutboxEmail(models.Model):
+    # Emails are queued here by accounts.utils and sent by the
+    # send_queued_emails management command, see accounts.outbox.
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return self.subject
 
 
+class ImageJob(models.Model):
+    # One row per image field that needs resized copies; queued by
+    # accounts.images when the field changes and drained by the
+    # process_image_jobs management command.
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
 
-              
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    field = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id', 'field'], name='unique_image_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.model}:{self.object_id}.{self.field}'
@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=2)
+# how long a worker may take over the rows it claimed before another
+# worker picks them up again
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def queue_email(mail_subject, message, to, from_email=None):
+    # Saved in the caller's transaction, so an email is only sent if the
+    # work that triggered it was committed.
+    return OutboxEmail.objects.create(
+        subject=mail_subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def queue_emails(emails, from_email=None):
+    # [(mail_subject, message, to), ...] in one insert
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            subject=mail_subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(to),
+        )
+        for mail_subject, message, to in emails
+    ])
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def claim_due(queryset, batch_size, now, lease=CLAIM_LEASE):
+    """
+    Claim up to ``batch_size`` due, pending rows of ``queryset`` (an
+    outbox-style model with ``status`` and ``next_attempt_at``) by moving
+    their next attempt past ``lease``. Row locks are held only for this
+    short transaction; the work on the rows happens after it, and rows a
+    dead worker never finished come due again when the lease runs out.
+    """
+    model = queryset.model
+    with transaction.atomic():
+        # skip_locked lets several workers claim side by side
+        batch = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(status=model.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            model.objects.filter(pk__in=[row.pk for row in batch]).update(next_attempt_at=now + lease)
+    return batch
+
+
+def send_queued_emails(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch of due outbox emails over a single mail connection.
+
+    Each email is marked sent as soon as it has gone out, so a worker that
+    dies mid-batch resends at most the one it was on. Failed emails are
+    retried with exponential backoff and given up on after
+    ``max_attempts``. Returns the number of emails sent.
+    """
+    now = timezone.now()
+    batch = claim_due(OutboxEmail.objects.all(), batch_size, now)
+    if not batch:
+        return 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not open mail connection: %s', e)
+        for email in batch:
+            _failed(email, e, now, max_attempts)
+        return 0
+
+    sent = 0
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, email.from_email, to=email.to, connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning('Sending outbox email %s failed: %s', email.pk, e)
+                _failed(email, e, now, max_attempts)
+            else:
+                email.status = OutboxEmail.SENT
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+def _failed(email, error, now, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = OutboxEmail.FAILED
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
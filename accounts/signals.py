@@ -1,5 +1,6 @@
 from django.db.models.signals import post_save , pre_save 
 from django.dispatch import receiver
+from .images import track_image_field
 from .models import User, UserProfile
 
 @receiver(post_save, sender=User)
@@ -23,3 +24,7 @@ def post_save_create_profile_receiver(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=User)
 def pre_save_create_profile_receiver(sender, instance, **kwargs):
     print(instance.username , 'this user is being saved')
+
+
+track_image_field(UserProfile, 'profile_picture')
+track_image_field(UserProfile, 'cover_photo')
@@ -1,3 +1,207 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from marketplace.snapshot import get_menu_snapshot
+from marketplace.tests import create_food, create_vendor
+from menu.models import FoodItem
+from . import images
+from .images import process_image_jobs, queue_missing_image_jobs
+from .models import ImageJob, OutboxEmail, User
+from .outbox import queue_email, retry_delay, send_queued_emails
+from .utils import send_notification
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FailingBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise SMTPException('server unavailable')
+
+
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='Ann', last_name='Vendor', username='ann', email='ann@example.com', password='secret')
+
+    def test_notification_is_queued_not_sent(self):
+        send_notification('Approved', 'accounts/emails/admin_approval_email.html', {
+            'user': self.user, 'is_approved': True, 'to_email': self.user.email,
+        })
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ['ann@example.com'])
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.CountingBackend')
+    def test_batch_shares_one_connection(self):
+        for i in range(5):
+            queue_email(f'Hello {i}', 'body', to=[f'user{i}@example.com'])
+        CountingBackend.opened = 0
+        self.assertEqual(send_queued_emails(batch_size=10), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.SENT).exists())
+        self.assertEqual(send_queued_emails(), 0)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.FailingBackend')
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email('Hello', 'body', to=['ann@example.com'])
+        self.assertEqual(send_queued_emails(max_attempts=2), 0)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now() + retry_delay(1) - timedelta(seconds=5))
+        self.assertEqual(send_queued_emails(max_attempts=2), 0)
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        send_queued_emails(max_attempts=2)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.FAILED, 2))
+        self.assertIn('server unavailable', email.last_error)
+
+    def test_sent_emails_are_marked_one_by_one(self):
+        for i in range(3):
+            queue_email(f'Hello {i}', 'body', to=[f'user{i}@example.com'])
+        sent_before_crash = []
+
+        def send(message, fail_silently=False):
+            if len(sent_before_crash) == 2:
+                raise KeyboardInterrupt  # the worker dies
+            sent_before_crash.append(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count())
+            return 1
+
+        with mock.patch('accounts.outbox.EmailMessage.send', send), self.assertRaises(KeyboardInterrupt):
+            send_queued_emails()
+        self.assertEqual(sent_before_crash, [0, 1])
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 2)
+        # the third is leased, not due again until the lease runs out
+        self.assertEqual(send_queued_emails(), 0)
+        OutboxEmail.objects.filter(status=OutboxEmail.PENDING).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+def image_upload(name='photo.jpg', size=(2000, 1500), format='JPEG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'orange').save(buffer, format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageDerivativesTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.vendor = create_vendor('imagevendor')
+
+    def test_new_upload_is_resized_by_the_worker(self):
+        food = create_food(self.vendor, 'Soup')
+        food.image = image_upload()
+        food.save()
+        food.description = 'Hot'
+        food.save()
+        job = ImageJob.objects.get()
+        self.assertEqual((job.model, job.object_id, job.field), ('menu.fooditem', food.pk, 'image'))
+        # until the worker runs, templates get the original
+        self.assertEqual(food.image_variants.thumb_url, food.image.url)
+        self.assertEqual(food.image_variants.thumb_webp_url, '')
+        get_menu_snapshot(self.vendor.vendor_slug)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_image_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        food.refresh_from_db()
+        derivatives = food.image_derivatives
+        self.assertEqual(derivatives['source'], food.image.name)
+        self.assertRegex(derivatives['thumb'], r'^foodimages/photo[^/]*\.[0-9a-f]{12}\.thumb\.jpg$')
+        with food.image.storage.open(derivatives['thumb_webp']) as f:
+            self.assertEqual(Image.open(f).size, (320, 240))
+        with food.image.storage.open(derivatives['medium']) as f:
+            self.assertEqual(Image.open(f).size, (1280, 960))
+        # the cached menu was dropped and picks up the new files
+        food_data = get_menu_snapshot(self.vendor.vendor_slug)['categories'][0]['fooditems'][0]
+        self.assertTrue(food_data['image_thumb_webp_url'].endswith('.thumb.webp'))
+
+        # nothing left to do until the image changes
+        self.assertEqual(process_image_jobs(), 0)
+        self.assertEqual(queue_missing_image_jobs(), 0)
+
+    def test_profile_pictures_keep_transparency(self):
+        profile = self.vendor.user_profile
+        profile.profile_picture = image_upload('logo.png', size=(600, 600), format='PNG', mode='RGBA')
+        profile.save()
+        self.assertEqual(process_image_jobs(), 1)
+        profile.refresh_from_db()
+        self.assertTrue(profile.profile_picture_variants.thumb_url.endswith('.thumb.png'))
+        self.assertEqual(profile.cover_photo_variants.medium_url, '')
+
+    def test_files_that_are_not_images_fail_at_once(self):
+        food = create_food(self.vendor, 'Soup')
+        food.image = SimpleUploadedFile('notes.jpg', b'not an image')
+        food.save()
+        self.assertEqual(process_image_jobs(), 0)
+        job = ImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (ImageJob.FAILED, 1))
+
+    def test_jobs_are_claimed_and_marked_one_by_one(self):
+        tea = create_food(self.vendor, 'Tea')
+        tea.image = image_upload('tea.jpg')
+        tea.save()
+        soup = create_food(self.vendor, 'Soup')
+        soup.image = image_upload()
+        soup.save()
+        resize = images.resize_image
+        done = []
+
+        def resize_and_upload(image):
+            done.append(list(ImageJob.objects.filter(status=ImageJob.DONE).values_list('object_id', flat=True)))
+            if image.name == soup.image.name:
+                # the batch is claimed rather than held locked, so a new
+                # upload re-arms the job while it is being resized
+                self.assertGreater(ImageJob.objects.get(object_id=soup.pk).next_attempt_at, timezone.now())
+                soup.image = image_upload('second.jpg')
+                soup.save()
+            return resize(image)
+
+        with mock.patch.object(images, 'resize_image', side_effect=resize_and_upload):
+            self.assertEqual(process_image_jobs(), 1)
+        self.assertEqual(done, [[], [tea.pk]])
+        job = ImageJob.objects.get(object_id=soup.pk)
+        self.assertEqual((job.status, job.attempts), (ImageJob.PENDING, 0))
+        self.assertLessEqual(job.next_attempt_at, timezone.now())
+        # the replaced image's derivatives were not stored
+        self.assertFalse(FoodItem.objects.get(pk=soup.pk).image_derivatives)
+        self.assertEqual(process_image_jobs(), 1)
+
+    def test_backfill_queues_images_without_current_copies(self):
+        food = create_food(self.vendor, 'Soup')
+        food.image = image_upload()
+        food.save()
+        process_image_jobs()
+        ImageJob.objects.all().delete()
+        create_food(self.vendor, 'Tea')
+        # stored before derivatives existed, or copied in by the menu import
+        FoodItem.objects.filter(food_title='Tea').update(image=food.image.name)
+        self.assertEqual(queue_missing_image_jobs(), 1)
+        self.assertEqual(process_image_jobs(), 1)
@@ -4,8 +4,7 @@ from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import EmailMessage
-from django.conf import settings
+from .outbox import queue_email, queue_emails
 
 
 
@@ -19,7 +18,6 @@ def detectUser(user):
     
 def send_verification_email(request, user , mail_subject , email_template):
 
-    from_email = settings.DEFAULT_FROM_EMAIL
     current_site = get_current_site(request)
     message = render_to_string(email_template,{
                                       'user': user,
@@ -29,14 +27,34 @@ def send_verification_email(request, user , mail_subject , email_template):
 
     })
     to_email = user.email
-    mail = EmailMessage(mail_subject, message, from_email, to=[to_email])
-    mail.send()
+    queue_email(mail_subject, message, to=[to_email])
 
 
 def send_notification(mail_subject, mail_template, context):
-    from_email = settings.DEFAULT_FROM_EMAIL
     to_email = context['to_email']
     message = render_to_string(mail_template, context)
-    mail = EmailMessage(mail_subject, message, from_email, to=[to_email])
-    mail.send()
-    
+    queue_email(mail_subject, message, to=[to_email])
+
+
+def send_notifications(mail_subject, mail_template, contexts):
+    # one email per context, queued together
+    queue_emails([
+        (mail_subject, render_to_string(mail_template, context), [context['to_email']])
+        for context in contexts
+    ])
+
+
+def fields_changed(instance, fields, update_fields=None):
+    """
+    Whether saving ``instance`` changes any of ``fields``, for pre_save
+    receivers. The stored row is read only when one of the fields is
+    being written, so saves that leave them out cost nothing.
+    """
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    if not fields:
+        return False
+    if instance._state.adding:
+        return any(getattr(instance, field) != instance._meta.get_field(field).get_default() for field in fields)
+    stored = type(instance)._default_manager.filter(pk=instance.pk).values_list(*fields).first()
+    return stored != tuple(getattr(instance, field) for field in fields)
@@ -14,6 +14,8 @@ from django.conf import settings
 from vendor.models import Vendor
 from django.template.defaultfilters import slugify
 from orders.models import Order
+from orders.rollups import vendor_sales_summary
+from orders.utils import vendor_order_inbox
 
 
 # restrict the vendor to access the customer page and vice versa
@@ -171,11 +173,12 @@ def myAccount(request):
 @login_required(login_url='login')
 @user_passes_test(check_role_customer)
 def custDashboard(request):
+    # the newest five come straight off the (user, is_ordered, created_at)
+    # index; the count is only needed when there may be more
     orders = Order.objects.filter(user=request.user, is_ordered=True)
-    recent_orders = orders[:5]
+    recent_orders = list(orders.order_by('-created_at', '-id')[:5])
     context = {
-        'orders': orders,
-        'orders_count': orders.count(),
+        'orders_count': orders.count() if len(recent_orders) == 5 else len(recent_orders),
         'recent_orders': recent_orders,
     }
     return render(request, 'accounts/custDashboard.html', context)
@@ -187,8 +190,14 @@ def custDashboard(request):
 def vendorDashboard(request):
     vendor  = Vendor.objects.get(user = request.user)
 
+    # 90 days of pre-aggregated daily rows instead of the raw order lines
+    sales = vendor_sales_summary(vendor)
+    recent_orders = vendor_order_inbox(vendor, page_size=5).items
+
     context = {
         'vendor': vendor,
+        'sales': sales,
+        'recent_orders': recent_orders,
     }
     return render(request ,'accounts/vendorDashboard.html', context )
 
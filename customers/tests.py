@@ -1,3 +1,67 @@
+import json
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.models import Order, OrderedFood
+from orders.tests import create_food, create_user, create_vendor
+from orders.utils import customer_order_history
+
+
+class CustomerOrderHistoryTest(TestCase):
+
+    def setUp(self):
+        self.customer = create_user('historycustomer')
+        vendor = create_vendor('historyvendor')
+        soup = create_food(vendor, 'Soup', '6.00')
+        tea = create_food(vendor, 'Tea', '2.50')
+        self.orders = []
+        for i in range(5):
+            order = Order.objects.create(
+                user=self.customer, order_number=f'HIST{i}', first_name='A', last_name='B', email='a@example.com',
+                address='Road 1', city='Dhaka', pin_code='1200', total=15.0, total_tax=0.5, payment_method='PayPal',
+                tax_data=json.dumps({'VAT': {'5.00': '0.73'}}), is_ordered=True,
+            )
+            OrderedFood.objects.create(order=order, user=self.customer, fooditem=soup, quantity=2, price=6.0, amount=12.0)
+            OrderedFood.objects.create(order=order, user=self.customer, fooditem=tea, quantity=1, price=2.5, amount=2.5)
+            self.orders.append(order)
+
+    def test_pages_with_subtotals_and_lines(self):
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(2):
+                page = customer_order_history(self.customer, cursor=cursor, page_size=2)
+                lines = [len(order.orderedfood_set.all()) for order in page.items]
+            self.assertEqual(lines, [2] * len(page.items))
+            self.assertTrue(all(order.subtotal == 14.5 for order in page.items))
+            seen += [order.order_number for order in page.items]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [f'HIST{i}' for i in reversed(range(5))])
+
+    def test_views(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('customer_my_orders'))
+        self.assertContains(response, 'Soup x2, Tea x1')
+
+        response = self.client.get(reverse('order_detail', args=['HIST3']))
+        self.assertEqual(response.context['subtotal'], 14.5)
+        self.assertEqual(response.context['tax_data'], {'VAT': {'5.00': '0.73'}})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('customer'))
+        # a LIMIT 5 read off the index, and the count since the page is full
+        order_queries = [q['sql'] for q in ctx.captured_queries if '"orders_order"' in q['sql']]
+        self.assertEqual(len(order_queries), 2)
+        self.assertIn('LIMIT 5', order_queries[0])
+        self.assertEqual(response.context['orders_count'], 5)
+        self.assertEqual([order.order_number for order in response.context['recent_orders']], [f'HIST{i}' for i in reversed(range(5))])
 
-# Create your tests here.
+    def test_other_customers_orders_are_hidden(self):
+        self.client.force_login(create_user('stranger'))
+        response = self.client.get(reverse('order_detail', args=['HIST1']))
+        self.assertEqual(response.status_code, 404)
@@ -6,6 +6,6 @@ from . import views
 urlpatterns = [
     path('', AccountViews.custDashboard, name='customer'),
     path('profile/', views.cprofile, name='cprofile'),
-    # path('my_orders/', views.my_orders, name='customer_my_orders'),
-    # path('order_detail/<int:order_number>/', views.order_detail, name='order_detail'),
+    path('my_orders/', views.my_orders, name='customer_my_orders'),
+    path('order_detail/<str:order_number>/', views.order_detail, name='order_detail'),
 ]
\ No newline at end of file
@@ -3,8 +3,9 @@ from django.contrib.auth.decorators import login_required
 from accounts.forms import UserInfoForm, UserProfileForm
 from accounts.models import UserProfile
 from django.contrib import messages
+from marketplace.utils import next_page_url
 from orders.models import Order, OrderedFood
-import simplejson as json
+from orders.utils import customer_order_history, with_subtotal
 
 
 @login_required(login_url='login')
@@ -33,30 +34,27 @@ def cprofile(request):
     return render(request, 'customers/cprofile.html', context)
 
 
-# def my_orders(request):
-#     orders = Order.objects.filter(user=request.user, is_ordered=True).order_by('-created_at')
-
-#     context = {
-#         'orders': orders,
-#     }
-#     return render(request, 'customers/my_orders.html', context)
+@login_required(login_url='login')
+def my_orders(request):
+    page = customer_order_history(request.user, cursor=request.GET.get('cursor'))
+    context = {
+        'orders': page.items,
+        'next_page_url': next_page_url(request, page.next_cursor),
+    }
+    return render(request, 'customers/my_orders.html', context)
 
 
-# def order_detail(request, order_number):
-#     try:
-#         order = Order.objects.get(order_number=order_number, is_ordered=True)
-#         ordered_food = OrderedFood.objects.filter(order=order)
-#         subtotal = 0
-#         for item in ordered_food:
-#             subtotal += (item.price * item.quantity)
-#         tax_data = json.loads(order.tax_data)
-#         context = {
-#             'order': order,
-#             'ordered_food': ordered_food,
-#             'subtotal': subtotal,
-#             'tax_data': tax_data,
-#         }
-#         return render(request, 'customers/order_detail.html', context)
-#     except:
-#         return redirect('customer')
-    
\ No newline at end of file
+@login_required(login_url='login')
+def order_detail(request, order_number):
+    order = get_object_or_404(
+        with_subtotal(Order.objects.select_related('payment')),
+        user=request.user, order_number=order_number, is_ordered=True,
+    )
+    ordered_food = OrderedFood.objects.filter(order=order).select_related('fooditem__vendor').order_by('id')
+    context = {
+        'order': order,
+        'ordered_food': ordered_food,
+        'subtotal': order.subtotal or 0,
+        'tax_data': order.tax_dict,
+    }
+    return render(request, 'customers/order_detail.html', context)
@@ -106,6 +106,29 @@ DATABASES = {
 AUTH_USER_MODEL = 'accounts.User'
 
 
+# The cache must be shared by every worker process: the menu snapshots, the
+# vendor count and the version keys of the in-process tax rules and vendor
+# geo index are invalidated through it. Set REDIS_URL to use Redis;
+# otherwise the database cache table is used (create it with
+# `python manage.py createcachetable`).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -2,17 +2,51 @@
 
 
 $(document).ready(function(){
-    // add to cart
-    $('.add_to_cart').on('click', function(e){
-        e.preventDefault();
-        
-        food_id = $(this).attr('data-id');
-        url = $(this).attr('data-url');
-        
-       
+    // Cart +/- clicks update the label right away and are queued; once the
+    // clicks settle the whole queue goes to the batch endpoint in one request.
+    var CART_BATCH_URL = '/cart/update/'
+    var CART_BATCH_DELAY = 300
+    var pendingOperations = []
+    var cartBatchTimer = null
+    var cartIds = {}
+
+    function getCookie(name){
+        var match = document.cookie.match(new RegExp('(^|;\\s*)' + name + '=([^;]*)'))
+        return match ? decodeURIComponent(match[2]) : null
+    }
+
+    function queueCartOperation(food_id, delta, cart_id){
+        var qty = parseInt($('#qty-'+food_id).html()) || 0
+        if(qty + delta < 0){
+            return
+        }
+        $('#qty-'+food_id).html(qty + delta)
+        if(cart_id){
+            cartIds[food_id] = cart_id
+        }
+        pendingOperations.push({'food_id': food_id, 'delta': delta})
+        clearTimeout(cartBatchTimer)
+        cartBatchTimer = setTimeout(flushCartOperations, CART_BATCH_DELAY)
+    }
+
+    function takeCartOperations(){
+        clearTimeout(cartBatchTimer)
+        var operations = pendingOperations
+        pendingOperations = []
+        return operations
+    }
+
+    function flushCartOperations(){
+        var operations = takeCartOperations()
+        if(!operations.length){
+            return
+        }
         $.ajax({
-            type: 'GET',
-            url: url,
+            type: 'POST',
+            url: CART_BATCH_URL,
+            contentType: 'application/json',
+            data: JSON.stringify({'operations': operations}),
+            headers: {'X-CSRFToken': getCookie('csrftoken')},
             success: function(response){
                 console.log(response)
                 if(response.status == 'login_required'){
@@ -20,10 +54,19 @@ $(document).ready(function(){
                         window.location = '/login';
                     })
                 }else if(response.status == 'Failed'){
-                    swal(response.message, '', 'error') 
+                    swal(response.message, '', 'error')
                 }else{
                     $('#cart_counter').html(response.cart_counter['cart_count']);
-                    $('#qty-'+food_id).html(response.qty);
+                    var queued = pendingOperations.map(function(operation){ return String(operation.food_id) })
+                    for(var food_id in response.quantities){
+                        // clicks made while this batch was in flight win
+                        if(queued.indexOf(food_id) == -1){
+                            $('#qty-'+food_id).html(response.quantities[food_id]);
+                        }
+                        if(window.location.pathname == '/cart/' && cartIds[food_id]){
+                            removeCartItem(response.quantities[food_id], cartIds[food_id]);
+                        }
+                    }
 
                     // subtotal, tax and grand total
                     applyCartAmounts(
@@ -31,9 +74,36 @@ $(document).ready(function(){
                         response.cart_amount['tax_dict'],
                         response.cart_amount['grand_total']
                     )
+
+                    if(window.location.pathname == '/cart/'){
+                        checkEmptyCart();
+                    }
                 }
             }
         })
+    }
+
+    // don't drop clicks made just before leaving the page
+    $(window).on('pagehide', function(){
+        var operations = takeCartOperations()
+        if(operations.length){
+            fetch(CART_BATCH_URL, {
+                method: 'POST',
+                keepalive: true,
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'X-Requested-With': 'XMLHttpRequest',
+                },
+                body: JSON.stringify({'operations': operations}),
+            })
+        }
+    })
+
+    // add to cart
+    $('.add_to_cart').on('click', function(e){
+        e.preventDefault();
+        queueCartOperation($(this).attr('data-id'), 1);
     })
 
 
@@ -47,41 +117,7 @@ $(document).ready(function(){
     // decrease cart
     $('.decrease_cart').on('click', function(e){
         e.preventDefault();
-        
-        food_id = $(this).attr('data-id');
-        url = $(this).attr('data-url');
-        cart_id = $(this).attr('id');
-        
-        
-        $.ajax({
-            type: 'GET',
-            url: url,
-            success: function(response){
-                console.log(response)
-                if(response.status == 'login_required'){
-                    swal(response.message, '', 'info').then(function(){
-                        window.location = '/login';
-                    })
-                }else if(response.status == 'Failed'){
-                    swal(response.message, '', 'error')
-                }else{
-                    $('#cart_counter').html(response.cart_counter['cart_count']);
-                    $('#qty-'+food_id).html(response.qty);
-
-                    applyCartAmounts(
-                        response.cart_amount['subtotal'],
-                        response.cart_amount['tax_dict'],
-                        response.cart_amount['grand_total']
-                    )
-
-                    if(window.location.pathname == '/cart/'){
-                        removeCartItem(response.qty, cart_id);
-                        checkEmptyCart();
-                    }
-                    
-                } 
-            }
-        })
+        queueCartOperation($(this).attr('data-id'), -1, $(this).attr('id'));
     })
 
 
@@ -30,6 +30,7 @@ urlpatterns = [
 
         # CART URL
     path('cart/', MarketplaceViews.cart , name='cart'),
+    path('cart/update/', MarketplaceViews.update_cart , name='update_cart'),
 
     # SEARCH URL
     path('search/', MarketplaceViews.search, name='search'),
@@ -1,11 +1,14 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 from vendor.models import Vendor
+from vendor.utils import attach_open_status
+from marketplace.utils import vendor_cards
 
 
 
 def home_view(request):
-    vendors = Vendor.objects.filter( is_approved=True , user__is_active = True ).order_by('created_at')[:8]
+    vendors = vendor_cards(Vendor.objects.filter( is_approved=True , user__is_active = True )).order_by('created_at')[:8]
+    vendors = attach_open_status(vendors)
     context = {
         'vendors': vendors,   
     }
@@ -0,0 +1,222 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, PositiveIntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from menu.models import FoodItem
+from .models import Cart
+from .taxes import compute_tax
+
+
+CENTS = Decimal('0.01')
+
+
+class CartSummary:
+    """Item count and money totals of a user's cart."""
+
+    def __init__(self, cart_count=0, subtotal=0, tax_dict=None):
+        self.cart_count = cart_count
+        self.subtotal = subtotal
+        self.tax_dict = tax_dict or {}
+        self.tax = sum(x for key in self.tax_dict.values() for x in key.values())
+        self.grand_total = subtotal + self.tax
+
+    def as_counter(self):
+        return dict(cart_count=self.cart_count)
+
+    def as_amounts(self):
+        return dict(subtotal=self.subtotal, tax=self.tax, grand_total=self.grand_total, tax_dict=self.tax_dict)
+
+
+def build_cart_summary(user):
+    # one joined aggregate for the cart lines; tax rules come from memory
+    totals = Cart.objects.filter(user=user).aggregate(
+        cart_count=Sum('quantity'),
+        subtotal=Sum(F('fooditem__price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+    subtotal = Decimal(totals['subtotal'] or 0).quantize(CENTS)
+    return CartSummary(
+        cart_count=totals['cart_count'] or 0,
+        subtotal=subtotal,
+        tax_dict=compute_tax(subtotal),
+    )
+
+
+def get_cart_summary(request, refresh=False):
+    """
+    The current user's cart summary, computed at most once per request.
+
+    Views that change the cart pass ``refresh=True`` so the numbers they
+    send back include the change.
+    """
+    if not request.user.is_authenticated:
+        return CartSummary()
+    if refresh or not hasattr(request, '_cart_summary'):
+        request._cart_summary = build_cart_summary(request.user)
+    return request._cart_summary
+
+
+# Quantity changes are applied in SQL (quantity = quantity + n) so
+# concurrent clicks can neither lose an update nor create a second row for
+# the same item (the unique_cart_item constraint backs this up). Both
+# PostgreSQL and SQLite (3.35+) support ON CONFLICT and RETURNING.
+
+def _now():
+    return Cart._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def increase_cart_item(user, fooditem_id):
+    """Add one ``fooditem_id`` to the cart. Returns the new quantity, or None if the item does not exist."""
+    now = _now()
+    cart = _table(Cart)
+    sql = (
+        f'INSERT INTO {cart} (user_id, fooditem_id, quantity, created_at, updated_at) '
+        f'SELECT %s, id, 1, %s, %s FROM {_table(FoodItem)} WHERE id = %s '
+        f'ON CONFLICT (user_id, fooditem_id) DO UPDATE '
+        f'SET quantity = CASE WHEN {cart}.quantity >= %s THEN %s ELSE {cart}.quantity + 1 END, '
+        f'updated_at = excluded.updated_at '
+        f'RETURNING quantity'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, now, now, fooditem_id, MAX_QUANTITY, MAX_QUANTITY])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def decrease_cart_item(user, fooditem_id):
+    """
+    Take one ``fooditem_id`` out of the cart, removing the line when it
+    reaches zero. Returns the new quantity, or None if it was not in the cart.
+    """
+    cart = _table(Cart)
+    # SQLite has no DELETE inside a CTE, so the two statements share a
+    # transaction instead; the UPDATE's row lock holds off concurrent adds
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {cart} SET quantity = quantity - 1, updated_at = %s '
+            f'WHERE user_id = %s AND fooditem_id = %s AND quantity > 0 RETURNING quantity',
+            [_now(), user.pk, fooditem_id],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if row[0] == 0:
+            cursor.execute(
+                f'DELETE FROM {cart} WHERE user_id = %s AND fooditem_id = %s AND quantity = 0',
+                [user.pk, fooditem_id],
+            )
+    return row[0]
+
+
+MAX_CART_OPERATIONS = 100
+# the id and quantity columns' ranges
+MAX_FOOD_ID = 2 ** 63 - 1
+MAX_QUANTITY = 2 ** 31 - 1
+
+
+def _integer(value, low, high):
+    # JSON numbers or numeric strings; 1.9 and out-of-range values are
+    # rejected rather than truncated
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+    elif not isinstance(value, (int, str)):
+        raise TypeError(value)
+    value = int(value)
+    if not low <= value <= high:
+        raise ValueError(value)
+    return value
+
+
+def coalesce_cart_operations(operations):
+    """
+    Fold ``[{'food_id': .., 'delta': ..} | {'food_id': .., 'quantity': ..}]``
+    into one change per food item: ``{food_id: ('delta' | 'quantity', n)}``.
+    A quantity replaces everything before it; later deltas adjust it.
+    Raises ValueError (or TypeError) on malformed operations.
+    """
+    changes = {}
+    for operation in operations:
+        food_id = _integer(operation['food_id'], 1, MAX_FOOD_ID)
+        if 'quantity' in operation:
+            changes[food_id] = ('quantity', _integer(operation['quantity'], 0, MAX_QUANTITY))
+        else:
+            kind, value = changes.get(food_id, ('delta', 0))
+            value += _integer(operation['delta'], -MAX_QUANTITY, MAX_QUANTITY)
+            value = min(max(value, -MAX_QUANTITY), MAX_QUANTITY)
+            changes[food_id] = (kind, max(value, 0) if kind == 'quantity' else value)
+    return changes
+
+
+def _add_quantities(user, deltas):
+    # positive deltas: insert the line or add to it in one statement
+    now = _now()
+    cart = _table(Cart)
+    rows = ', '.join(['(%s, %s, %s, %s, %s)'] * len(deltas))
+    params = [value for food_id, delta in deltas.items() for value in (user.pk, food_id, delta, now, now)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {cart} (user_id, fooditem_id, quantity, created_at, updated_at) VALUES {rows} '
+            f'ON CONFLICT (user_id, fooditem_id) DO UPDATE '
+            f'SET quantity = CASE WHEN {cart}.quantity > %s - excluded.quantity THEN %s '
+            f'ELSE {cart}.quantity + excluded.quantity END, updated_at = excluded.updated_at',
+            params + [MAX_QUANTITY, MAX_QUANTITY],
+        )
+
+
+def apply_cart_operations(user, operations):
+    """
+    Apply a batch of quantity changes in one transaction. Returns
+    ``{food_id: new_quantity}``; unknown food items are skipped.
+
+    Deltas are added in the database, so concurrent batches (or clicks)
+    on the same line all count; a quantity simply replaces the line.
+    """
+    changes = coalesce_cart_operations(operations)
+    if not changes:
+        return {}
+    with transaction.atomic():
+        food_ids = set(FoodItem.objects.filter(id__in=changes).values_list('id', flat=True))
+        lines = Cart.objects.filter(user=user)
+        added, taken, replaced = {}, {}, {}
+        for food_id in food_ids:
+            kind, value = changes[food_id]
+            if kind == 'quantity':
+                replaced[food_id] = value
+            elif value > 0:
+                added[food_id] = value
+            elif value < 0:
+                taken[food_id] = -value
+
+        if added:
+            _add_quantities(user, added)
+        if taken:
+            lines.filter(fooditem_id__in=taken).update(
+                quantity=Case(
+                    *[When(fooditem_id=food_id, then=Greatest(F('quantity') - value, Value(0))) for food_id, value in taken.items()],
+                    output_field=PositiveIntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+        if replaced:
+            now = timezone.now()
+            Cart.objects.bulk_create(
+                [Cart(user=user, fooditem_id=food_id, quantity=quantity, created_at=now, updated_at=now)
+                 for food_id, quantity in replaced.items() if quantity > 0],
+                update_conflicts=True,
+                unique_fields=['user', 'fooditem'],
+                update_fields=['quantity', 'updated_at'],
+            )
+        removed = [food_id for food_id, quantity in replaced.items() if quantity == 0]
+        lines.filter(Q(quantity=0) | Q(fooditem_id__in=removed), fooditem_id__in=food_ids).delete()
+        quantities = dict.fromkeys(food_ids, 0)
+        quantities.update(lines.filter(fooditem_id__in=food_ids).values_list('fooditem_id', 'quantity'))
+    return quantities
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.models import SearchTerm
+from marketplace.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the vendor and food item search index from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {SearchTerm.objects.count()} search terms.'))
@@ -0,0 +1,120 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from .search import MIN_PREFIX_LENGTH, tokenize
+
+
+# menu indexes kept per process, most recently used last
+MAX_CACHED_INDEXES = 256
+_indexes = OrderedDict()
+
+
+def _bits(positions):
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+    return mask
+
+
+class MenuIndex:
+    """
+    Column store over one vendor's menu snapshot.
+
+    Food items are numbered by their position in the snapshot and every
+    filter is a bitmap over those positions: one per category, one per
+    indexed term, and a price range taken from the price-sorted column with
+    bisect. A query ANDs the bitmaps and walks the set bits once.
+    """
+
+    def __init__(self, snapshot):
+        self.revision = snapshot['revision']
+        self.foods = [food for category in snapshot['categories'] for food in category['fooditems']]
+        self.all = (1 << len(self.foods)) - 1
+
+        categories = defaultdict(list)
+        terms = defaultdict(list)
+        category_names = {category['id']: category['category_name'] for category in snapshot['categories']}
+        for position, food in enumerate(self.foods):
+            categories[food['category_id']].append(position)
+            text = ' '.join((food['food_title'], food['description'], category_names[food['category_id']]))
+            for term in set(tokenize(text)):
+                terms[term].append(position)
+        self.categories = {category_id: _bits(positions) for category_id, positions in categories.items()}
+        self.term_bits = {term: _bits(positions) for term, positions in terms.items()}
+        self.terms = sorted(self.term_bits)
+
+        by_price = sorted(range(len(self.foods)), key=lambda position: Decimal(self.foods[position]['price']))
+        self.prices = [Decimal(self.foods[position]['price']) for position in by_price]
+        self.price_order = by_price
+
+    def __len__(self):
+        return len(self.foods)
+
+    def category_mask(self, category_id):
+        try:
+            return self.categories.get(int(category_id), 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def price_mask(self, min_price=None, max_price=None):
+        lo = 0 if min_price is None else bisect_left(self.prices, min_price)
+        hi = len(self.prices) if max_price is None else bisect_right(self.prices, max_price)
+        return _bits(self.price_order[lo:hi])
+
+    def token_mask(self, token):
+        # whole term match, or any term it prefixes (same rules as search_index)
+        if len(token) < MIN_PREFIX_LENGTH:
+            return self.term_bits.get(token, 0)
+        mask = 0
+        i = bisect_left(self.terms, token)
+        while i < len(self.terms) and self.terms[i].startswith(token):
+            mask |= self.term_bits[self.terms[i]]
+            i += 1
+        return mask
+
+    def text_mask(self, keyword):
+        mask = self.all
+        for token in set(tokenize(keyword)):
+            mask &= self.token_mask(token)
+            if not mask:
+                break
+        return mask
+
+    def filter(self, category_id=None, min_price=None, max_price=None, keyword=None):
+        """Food items matching every given filter, in menu order."""
+        mask = self.all
+        if category_id:
+            mask &= self.category_mask(category_id)
+        if min_price is not None or max_price is not None:
+            mask &= self.price_mask(min_price, max_price)
+        if keyword and mask:
+            mask &= self.text_mask(keyword)
+
+        foods = []
+        while mask:
+            low = mask & -mask
+            foods.append(self.foods[low.bit_length() - 1])
+            mask ^= low
+        return foods
+
+
+def get_menu_index(snapshot):
+    # Rebuilt only when the snapshot it was built from has been replaced.
+    key = snapshot['vendor']['id']
+    index = _indexes.get(key)
+    if index is None or index.revision != snapshot['revision']:
+        index = MenuIndex(snapshot)
+        _indexes[key] = index
+        if len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    _indexes.move_to_end(key)
+    return index
+
+
+def parse_price(value):
+    try:
+        price = Decimal(value) if value else None
+    except (InvalidOperation, ValueError):
+        return None
+    return price if price is not None and price.is_finite() else None
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from marketplace.search import fooditem_terms, vendor_terms
+
+
+def build_search_index(apps, schema_editor):
+    SearchTerm = apps.get_model('marketplace', 'SearchTerm')
+    Vendor = apps.get_model('vendor', 'Vendor')
+    FoodItem = apps.get_model('menu', 'FoodItem')
+    rows = []
+    for vendor in Vendor.objects.all():
+        for term, weight in vendor_terms(vendor.vendor_name).items():
+            rows.append(SearchTerm(term=term, vendor_id=vendor.id, weight=weight))
+    for food in FoodItem.objects.filter(is_available=True).select_related('category'):
+        for term, weight in fooditem_terms(food.food_title, food.description, food.category.category_name).items():
+            rows.append(SearchTerm(term=term, vendor_id=food.vendor_id, fooditem_id=food.id, weight=weight))
+    SearchTerm.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_tax'),
+        ('menu', '0007_alter_fooditem_category'),
+        ('vendor', '0005_vendor_opening_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=50)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('fooditem', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='menu.fooditem')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendor.vendor')),
+            ],
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
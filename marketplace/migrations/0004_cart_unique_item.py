@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    # fold duplicate (user, fooditem) rows into the oldest one
+    Cart = apps.get_model('marketplace', 'Cart')
+    duplicates = (
+        Cart.objects.values('user_id', 'fooditem_id')
+        .annotate(rows=Count('id'), quantity=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        items = Cart.objects.filter(user_id=row['user_id'], fooditem_id=row['fooditem_id']).order_by('created_at', 'id')
+        keep = items.first()
+        items.exclude(pk=keep.pk).delete()
+        Cart.objects.filter(pk=keep.pk).update(quantity=row['quantity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_searchterm'),
+        ('menu', '0007_alter_fooditem_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'fooditem'), name='unique_cart_item'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from accounts.models import User
 from menu.models import FoodItem
+from vendor.models import Vendor
 
 # Create your models here.
 
@@ -12,6 +13,12 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # one row per item; quantity changes go through marketplace.cart
+            models.UniqueConstraint(fields=['user', 'fooditem'], name='unique_cart_item'),
+        ]
+
     def __unicode__(self):
         return self.user
     
@@ -29,10 +36,16 @@ class Tax(models.Model):
 
     def __str__(self):
         return self.tax_type
-    
-
-    
-
 
 
+class SearchTerm(models.Model):
+    # Inverted index row: one token of a vendor name (fooditem is null) or of
+    # a food item's title, description or category name. Kept up to date by
+    # marketplace.signals, see marketplace.search.
+    term = models.CharField(max_length=50, db_index=True)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    fooditem = models.ForeignKey(FoodItem, on_delete=models.CASCADE, blank=True, null=True)
+    weight = models.PositiveSmallIntegerField()
 
+    def __str__(self):
+        return self.term
@@ -0,0 +1,192 @@
+import operator
+import re
+from collections import defaultdict
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+
+from menu.models import FoodItem
+from vendor.models import Vendor
+from .models import SearchTerm
+
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 50
+# shorter query tokens only match whole terms, not prefixes
+MIN_PREFIX_LENGTH = 2
+
+VENDOR_NAME_WEIGHT = 8
+FOOD_TITLE_WEIGHT = 4
+CATEGORY_NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def build_terms(fields):
+    # [(text, weight), ...] -> {term: weight}; a term that appears in several
+    # fields gets the sum of their weights
+    terms = defaultdict(int)
+    for text, weight in fields:
+        for token in set(tokenize(text)):
+            terms[token] += weight
+    return terms
+
+
+def fooditem_terms(food_title, description, category_name):
+    return build_terms([
+        (food_title, FOOD_TITLE_WEIGHT),
+        (description, DESCRIPTION_WEIGHT),
+        (category_name, CATEGORY_NAME_WEIGHT),
+    ])
+
+
+def vendor_terms(vendor_name):
+    return build_terms([(vendor_name, VENDOR_NAME_WEIGHT)])
+
+
+def _fooditem_rows(food, category_name):
+    if not food.is_available:
+        return []
+    terms = fooditem_terms(food.food_title, food.description, category_name)
+    return [SearchTerm(term=term, vendor_id=food.vendor_id, fooditem_id=food.id, weight=weight) for term, weight in terms.items()]
+
+
+def _vendor_rows(vendor):
+    return [SearchTerm(term=term, vendor_id=vendor.id, weight=weight) for term, weight in vendor_terms(vendor.vendor_name).items()]
+
+
+def index_fooditem(food):
+    SearchTerm.objects.filter(fooditem_id=food.id).delete()
+    SearchTerm.objects.bulk_create(_fooditem_rows(food, food.category.category_name))
+
+
+def index_fooditems(foods):
+    # bulk counterpart of index_fooditem; each food's category must be loaded
+    SearchTerm.objects.filter(fooditem_id__in=[food.id for food in foods]).delete()
+    rows = []
+    for food in foods:
+        rows.extend(_fooditem_rows(food, food.category.category_name))
+    SearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_category(category):
+    # the category name is part of every one of its food items' documents
+    foods = list(FoodItem.objects.filter(category=category))
+    SearchTerm.objects.filter(fooditem__in=foods).delete()
+    rows = []
+    for food in foods:
+        rows.extend(_fooditem_rows(food, category.category_name))
+    SearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_vendor(vendor):
+    SearchTerm.objects.filter(vendor_id=vendor.id, fooditem__isnull=True).delete()
+    SearchTerm.objects.bulk_create(_vendor_rows(vendor))
+
+
+def rebuild_search_index(batch_size=2000):
+    SearchTerm.objects.all().delete()
+    rows = []
+    for vendor in Vendor.objects.only('id', 'vendor_name').iterator(chunk_size=batch_size):
+        rows.extend(_vendor_rows(vendor))
+    foods = FoodItem.objects.filter(is_available=True).select_related('category')
+    for food in foods.iterator(chunk_size=batch_size):
+        rows.extend(_fooditem_rows(food, food.category.category_name))
+        if len(rows) >= batch_size:
+            SearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+            rows = []
+    SearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+
+
+class SearchResults:
+    def __init__(self, vendor_scores, food_scores):
+        self.vendor_scores = vendor_scores
+        self.food_scores = food_scores
+
+    @staticmethod
+    def _ranked(scores):
+        return [pk for pk, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    @property
+    def vendor_ids(self):
+        return self._ranked(self.vendor_scores)
+
+    @property
+    def food_ids(self):
+        return self._ranked(self.food_scores)
+
+
+def _term_lookup(token):
+    if len(token) < MIN_PREFIX_LENGTH:
+        return Q(term=token)
+    if connection.vendor != 'sqlite':
+        # PostgreSQL answers LIKE 'token%' from the varchar_pattern_ops
+        # index Django adds next to the term index; a range would follow the
+        # collation, which need not keep a prefix's terms together
+        return Q(term__startswith=token)
+    # SQLite's LIKE cannot use the index, but its binary collation orders
+    # terms by code point, so a range over the prefix can
+    upper = token[:-1] + chr(ord(token[-1]) + 1)
+    return Q(term__gte=token, term__lt=upper, term__startswith=token)
+
+
+def search_index(keyword, vendor=None, vendors=None):
+    """
+    Relevance ranked vendor and food item hits for ``keyword``.
+
+    Every query token has to match (as a whole term or as a term prefix)
+    somewhere in the document. Exact term matches count double. A vendor
+    scores its name match plus its best food item match.
+    ``vendors`` (a queryset) limits the hits to those vendors.
+    Returns None for an empty keyword so callers can skip text filtering.
+    """
+    tokens = list(dict.fromkeys(tokenize(keyword)))
+    if not tokens:
+        return None
+
+    # One grouped query: a column per query token holding that token's
+    # score in the document, so the "every token matched" test and the
+    # ranking happen in the database and only hits come back.
+    lookups = []
+    matches = {}
+    for i, token in enumerate(tokens):
+        lookups.append(_term_lookup(token))
+        if len(token) >= MIN_PREFIX_LENGTH:
+            score = Case(When(term=token, then=F('weight') * 2), When(term__startswith=token, then=F('weight')), default=0, output_field=IntegerField())
+        else:
+            score = Case(When(term=token, then=F('weight') * 2), default=0, output_field=IntegerField())
+        matches[f'match_{i}'] = Sum(score)
+
+    rows = SearchTerm.objects.filter(reduce(operator.or_, lookups))
+    if vendor is not None:
+        rows = rows.filter(vendor=vendor)
+    if vendors is not None:
+        rows = rows.filter(vendor__in=vendors.values('id'))
+    if len(tokens) > 1:
+        # only food items containing the longest (usually rarest) token can
+        # match every token, so narrow the aggregation to those first
+        anchor = SearchTerm.objects.filter(_term_lookup(max(tokens, key=len)), fooditem__isnull=False)
+        rows = rows.filter(Q(fooditem__isnull=True) | Q(fooditem__in=anchor.values('fooditem_id')))
+    rows = rows.values('vendor_id', 'fooditem_id').annotate(**matches).filter(**{f'{name}__gt': 0 for name in matches})
+
+    foods = {}
+    vendors = {}
+    food_vendor = {}
+    for row in rows:
+        score = sum(row[name] for name in matches)
+        if row['fooditem_id'] is None:
+            vendors[row['vendor_id']] = score
+        else:
+            foods[row['fooditem_id']] = score
+            food_vendor[row['fooditem_id']] = row['vendor_id']
+
+    best_food = defaultdict(int)
+    for pk, score in foods.items():
+        best_food[food_vendor[pk]] = max(best_food[food_vendor[pk]], score)
+    for vendor_id, score in best_food.items():
+        vendors[vendor_id] = vendors.get(vendor_id, 0) + score
+    return SearchResults(vendors, foods)
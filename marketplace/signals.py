@@ -0,0 +1,93 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from accounts.images import derivatives_ready
+from accounts.models import UserProfile
+from menu.models import Category, FoodItem
+from vendor.models import OpeningHour, Vendor
+from vendor.signals import vendor_activation_changed
+from .models import Tax
+from .search import index_category, index_fooditem, index_vendor
+from .snapshot import invalidate_menu_snapshot, invalidate_vendor_menu_snapshot
+from .taxes import invalidate_tax_rules
+from .utils import invalidate_vendor_count
+
+
+# Deleted rows drop out of the search index through the SearchTerm FK cascade.
+
+@receiver(post_save, sender=FoodItem)
+def index_fooditem_receiver(sender, instance, **kwargs):
+    index_fooditem(instance)
+
+
+@receiver(post_save, sender=Category)
+def index_category_receiver(sender, instance, created, **kwargs):
+    if not created:
+        index_category(instance)
+
+
+@receiver(post_save, sender=Vendor)
+def index_vendor_receiver(sender, instance, **kwargs):
+    index_vendor(instance)
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def vendor_count_receiver(sender, instance, **kwargs):
+    invalidate_vendor_count()
+
+
+# Menu snapshots (see marketplace.snapshot) are dropped on any change to
+# the data they were built from and rebuilt on the next page hit.
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+@receiver(post_save, sender=OpeningHour)
+@receiver(post_delete, sender=OpeningHour)
+def menu_changed_receiver(sender, instance, **kwargs):
+    invalidate_vendor_menu_snapshot(pk=instance.vendor_id)
+
+
+@receiver(pre_save, sender=Vendor)
+def remember_vendor_slug_receiver(sender, instance, update_fields=None, **kwargs):
+    # a renamed vendor's snapshot under the old slug must go too
+    if not instance._state.adding and (update_fields is None or 'vendor_slug' in update_fields):
+        instance._stored_vendor_slug = Vendor.objects.filter(pk=instance.pk).values_list('vendor_slug', flat=True).first()
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def vendor_snapshot_receiver(sender, instance, **kwargs):
+    invalidate_menu_snapshot(instance.vendor_slug, instance.__dict__.pop('_stored_vendor_slug', None))
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_snapshot_receiver(sender, instance, **kwargs):
+    invalidate_vendor_menu_snapshot(user_profile=instance)
+
+
+@receiver(derivatives_ready, sender=FoodItem)
+def fooditem_derivatives_snapshot_receiver(sender, instance, **kwargs):
+    invalidate_vendor_menu_snapshot(pk=instance.vendor_id)
+
+
+@receiver(derivatives_ready, sender=UserProfile)
+def profile_derivatives_snapshot_receiver(sender, instance, **kwargs):
+    invalidate_vendor_menu_snapshot(user_profile=instance)
+
+
+@receiver(vendor_activation_changed)
+def vendor_activation_snapshot_receiver(sender, user, **kwargs):
+    invalidate_vendor_menu_snapshot(user=user)
+
+
+@receiver(vendor_activation_changed)
+def vendor_activation_count_receiver(sender, user, **kwargs):
+    invalidate_vendor_count()
+
+
+@receiver(post_save, sender=Tax)
+@receiver(post_delete, sender=Tax)
+def tax_changed_receiver(sender, instance, **kwargs):
+    invalidate_tax_rules()
@@ -0,0 +1,126 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from menu.models import Category, FoodItem
+from vendor.models import OpeningHour, Vendor
+
+
+# Bump when the snapshot layout changes so old entries are never read.
+SNAPSHOT_VERSION = 2
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+def _menu_version_key(vendor_slug):
+    return f'menu_snapshot_version:{vendor_slug}'
+
+
+def snapshot_key(vendor_slug):
+    # Snapshots are stored under the vendor's current menu version in the
+    # shared cache, and invalidating starts a new version. A snapshot built
+    # from rows read just before a change commits lands under the old
+    # version, where nobody looks for it any more.
+    version_key = _menu_version_key(vendor_slug)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, SNAPSHOT_TIMEOUT)
+        version = cache.get(version_key)
+    return f'menu_snapshot:v{SNAPSHOT_VERSION}:{vendor_slug}:{version}'
+
+
+def _file_url(field):
+    return field.url if field else ''
+
+
+def build_menu_snapshot(vendor):
+    """
+    Everything vendor_detail and filter_foods need for one vendor, as plain
+    data: vendor card, categories with their available items, price bounds
+    and the opening hours / weekly schedule.
+    """
+    profile = vendor.user_profile
+    categories = Category.objects.filter(vendor=vendor).order_by('created_at', 'id').prefetch_related(
+        Prefetch('fooditems', queryset=FoodItem.objects.filter(is_available=True).order_by('id'))
+    )
+    opening_hours = OpeningHour.objects.filter(vendor=vendor).order_by('day', '-from_hour')
+
+    prices = []
+    category_data = []
+    for category in categories:
+        foods = []
+        for food in category.fooditems.all():
+            prices.append(food.price)
+            foods.append({
+                'id': food.id,
+                'food_title': food.food_title,
+                'description': food.description or '',
+                'price': str(food.price),
+                'image_url': _file_url(food.image),
+                'image_thumb_url': food.image_variants.thumb_url,
+                'image_thumb_webp_url': food.image_variants.thumb_webp_url,
+                'category_id': category.id,
+            })
+        category_data.append({
+            'id': category.id,
+            'category_name': category.category_name,
+            'description': category.description or '',
+            'fooditems': foods,
+        })
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        # identifies this particular build, e.g. for in-process memoization
+        'revision': uuid.uuid4().hex,
+        'vendor': {
+            'id': vendor.id,
+            'user_id': vendor.user_id,
+            'vendor_name': vendor.vendor_name,
+            'vendor_slug': vendor.vendor_slug,
+            'address': profile.address or '',
+            'profile_picture_url': _file_url(profile.profile_picture),
+            'profile_picture_thumb_url': profile.profile_picture_variants.thumb_url,
+            'profile_picture_thumb_webp_url': profile.profile_picture_variants.thumb_webp_url,
+            'cover_photo_url': _file_url(profile.cover_photo),
+            'cover_photo_medium_url': profile.cover_photo_variants.medium_url,
+        },
+        'categories': category_data,
+        'min_price': str(min(prices)) if prices else '0',
+        'max_price': str(max(prices)) if prices else '0',
+        'opening_hours': [{
+            'day': hour.day,
+            'day_display': hour.get_day_display(),
+            'from_hour': hour.from_hour,
+            'to_hour': hour.to_hour,
+            'is_closed': hour.is_closed,
+        } for hour in opening_hours],
+        'opening_schedule': vendor.opening_schedule,
+    }
+
+
+def get_menu_snapshot(vendor_slug):
+    # Returns None for unknown, unapproved or inactive vendors.
+    key = snapshot_key(vendor_slug)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        vendor = Vendor.objects.filter(
+            vendor_slug=vendor_slug, is_approved=True, user__is_active=True
+        ).select_related('user_profile').order_by('id').first()
+        if vendor is None:
+            return None
+        snapshot = build_menu_snapshot(vendor)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate_menu_snapshot(*vendor_slugs):
+    # once the change is committed, so no worker rebuilds from the old rows
+    keys = [_menu_version_key(vendor_slug) for vendor_slug in vendor_slugs if vendor_slug]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_vendor_menu_snapshot(**filters):
+    # for changes that only know the vendor by id, user or profile
+    invalidate_menu_snapshot(*Vendor.objects.filter(**filters).values_list('vendor_slug', flat=True))
@@ -0,0 +1,77 @@
+import time
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Tax
+
+
+TAX_RULES_VERSION_KEY = 'tax_rules_version'
+# seconds between checks of the shared version key; another worker's tax
+# change shows up here within this long
+TAX_RULES_CHECK_INTERVAL = 5
+
+TaxRule = namedtuple('TaxRule', ['tax_type', 'tax_percentage'])
+
+_rules = None
+_version = None
+_checked_at = None
+
+
+def load_tax_rules():
+    return tuple(
+        TaxRule(tax_type, tax_percentage)
+        for tax_type, tax_percentage in Tax.objects.filter(is_active=True).order_by('id').values_list('tax_type', 'tax_percentage')
+    )
+
+
+def _current_version():
+    version = cache.get(TAX_RULES_VERSION_KEY)
+    if version is None:
+        # never set, or evicted: start a new version so no worker keeps
+        # rules loaded while the key was missing
+        cache.add(TAX_RULES_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TAX_RULES_VERSION_KEY)
+    return version
+
+
+def get_tax_rules():
+    # Same scheme as the vendor geo index: the rules live in process memory
+    # and the version key in the shared cache (see CACHES in settings) tells
+    # every worker to reload. The key is read at most once per
+    # TAX_RULES_CHECK_INTERVAL, so pricing a page costs no query.
+    global _rules, _version, _checked_at
+    now = time.monotonic()
+    if _rules is not None and _checked_at is not None and now - _checked_at < TAX_RULES_CHECK_INTERVAL:
+        return _rules
+    version = _current_version()
+    if _rules is None or _version != version:
+        _rules = load_tax_rules()
+        _version = version
+    _checked_at = now
+    return _rules
+
+
+def _bump_version():
+    global _checked_at
+    cache.set(TAX_RULES_VERSION_KEY, uuid.uuid4().hex, None)
+    # this worker sees its own change at once
+    _checked_at = None
+
+
+def invalidate_tax_rules():
+    # once the change is committed; a worker reloading before that would
+    # keep the old rows under the new version
+    transaction.on_commit(_bump_version)
+
+
+def compute_tax(subtotal, rules=None):
+    """``{tax_type: {percentage: amount}}`` for ``subtotal`` under the active rules."""
+    if rules is None:
+        rules = get_tax_rules()
+    return {
+        rule.tax_type: {str(rule.tax_percentage): round((rule.tax_percentage * subtotal) / 100, 2)}
+        for rule in rules
+    }
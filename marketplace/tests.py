@@ -1,3 +1,627 @@
-from django.test import TestCase
+import os
+import random
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User, UserProfile
+from menu.models import Category, FoodItem
+from vendor.models import OpeningHour, Vendor
+from .cart import MAX_QUANTITY, apply_cart_operations, build_cart_summary, coalesce_cart_operations, decrease_cart_item, get_cart_summary, increase_cart_item
+from .context_processors import get_cart_amounts, get_cart_counter
+from .models import Cart, SearchTerm, Tax
+from .search import fooditem_terms, search_index
+from .menu_index import MenuIndex, get_menu_index
+from .snapshot import get_menu_snapshot, snapshot_key
+from .taxes import TAX_RULES_VERSION_KEY, compute_tax, get_tax_rules, invalidate_tax_rules
+from .utils import keyset_paginate, paginate_ids
+
+
+class DataQueries(CaptureQueriesContext):
+    # Leaves out the cache's own queries: the shared cache is a database
+    # table unless REDIS_URL is set, see CACHES in settings.
+
+    @property
+    def captured_queries(self):
+        return [query for query in super().captured_queries if 'django_cache' not in query['sql']]
+
+
+def create_vendor(name, is_approved=True):
+    user = User.objects.create_user(first_name=name, last_name='Owner', username=name, email=f'{name}@example.com', password='secret')
+    user.role = User.VENDOR
+    user.is_active = True
+    user.save()
+    user_profile = UserProfile.objects.get(user=user)
+    return Vendor.objects.create(
+        user=user,
+        user_profile=user_profile,
+        vendor_name=name,
+        vendor_slug=name,
+        vendor_license='vendor/license/license.jpg',
+        is_approved=is_approved,
+    )
+
+
+def create_food(vendor, title, category=None, description='', price='10.00', is_available=True):
+    if category is None:
+        category, _ = Category.objects.get_or_create(vendor=vendor, category_name='General')
+    return FoodItem.objects.create(
+        vendor=vendor,
+        category=category,
+        food_title=title,
+        description=description,
+        price=price,
+        image='foodimages/food.jpg',
+        is_available=is_available,
+    )
+
+
+class MarketplaceListingQueryTest(TestCase):
+
+    def add_vendors(self, count):
+        start = Vendor.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                vendor = create_vendor(f'vendor{i}')
+                for day in range(1, 8):
+                    OpeningHour.objects.create(vendor=vendor, day=day, from_hour='12:00 AM', to_hour='11:30 PM')
+
+    def count_listing_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('marketplace'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.add_vendors(2)
+        small, response = self.count_listing_queries()
+        self.assertEqual(response.context['vendor_count'], 2)
+
+        self.add_vendors(10)
+        large, response = self.count_listing_queries()
+        self.assertEqual(response.context['vendor_count'], 12)
+        self.assertEqual(small, large)
+
+    def test_open_status_is_attached(self):
+        self.add_vendors(1)
+        create_vendor('closedvendor')
+        _, response = self.count_listing_queries()
+        status = {v.vendor_name: v.is_open for v in response.context['vendors']}
+        self.assertFalse(status['closedvendor'])
+        self.assertEqual(status['vendor0'], Vendor.objects.get(vendor_name='vendor0').is_open())
+
+
+class VendorDetailScheduleTest(TestCase):
+
+    def test_detail_uses_precomputed_schedule(self):
+        vendor = create_vendor('detailvendor')
+        for day in range(1, 8):
+            OpeningHour.objects.create(vendor=vendor, day=day, from_hour='12:00 AM', to_hour='12:00 AM')
+        response = self.client.get(reverse('vendor_detail', args=[vendor.vendor_slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['vendor']['is_open'])
+        self.assertEqual(len(response.context['current_opening_hours']), 1)
+        self.assertIsNotNone(response.context['closes_at'])
+        self.assertIsNone(response.context['opens_next_at'])
+
+
+class MenuSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('snapvendor')
+        self.pizza = create_food(self.vendor, 'Pizza', price='12.50')
+        self.url = reverse('vendor_detail', args=[self.vendor.vendor_slug])
+
+    def test_repeat_hits_are_served_from_snapshot(self):
+        self.client.get(self.url)
+        with DataQueries(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(response.context['categories'][0]['fooditems'][0]['id'], self.pizza.id)
+        self.assertEqual(str(response.context['max_price']), '12.50')
+
+    def test_menu_changes_invalidate_snapshot(self):
+        get_menu_snapshot(self.vendor.vendor_slug)
+        self.pizza.food_title = 'Margherita'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizza.save()
+            # not before the change is committed
+            self.assertIsNotNone(cache.get(snapshot_key(self.vendor.vendor_slug)))
+        self.assertIsNone(cache.get(snapshot_key(self.vendor.vendor_slug)))
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Margherita')
+
+        self.vendor.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_renamed_vendor_drops_old_snapshot(self):
+        old_slug = self.vendor.vendor_slug
+        get_menu_snapshot(old_slug)
+        self.vendor.vendor_slug = 'newsnapvendor'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.save()
+        self.assertIsNone(get_menu_snapshot(old_slug))
+        self.assertEqual(get_menu_snapshot('newsnapvendor')['vendor']['vendor_slug'], 'newsnapvendor')
+
+    def test_filter_foods_reads_snapshot(self):
+        create_food(self.vendor, 'Salad', price='5.00')
+        self.client.force_login(self.vendor.user)
+        response = self.client.get(
+            reverse('filter_foods', args=[self.vendor.vendor_slug]), {'max_price': '10'},
+            headers={'x-requested-with': 'XMLHttpRequest'},
+        )
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['foods'][0]['title'], 'Salad')
+
+
+class MenuIndexTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('indexvendor')
+        drinks = Category.objects.create(vendor=self.vendor, category_name='Cold Drinks')
+        self.burger = create_food(self.vendor, 'Beef Burger', price='8.00')
+        self.lassi = create_food(self.vendor, 'Mango Lassi', category=drinks, description='sweet yogurt', price='3.50')
+        self.cola = create_food(self.vendor, 'Cola', category=drinks, price='2.00')
+        self.snapshot = get_menu_snapshot(self.vendor.vendor_slug)
+        self.index = MenuIndex(self.snapshot)
+
+    def ids(self, **filters):
+        return {food['id'] for food in self.index.filter(**filters)}
+
+    def test_filters(self):
+        drinks = self.lassi.category_id
+        self.assertEqual(self.ids(), {self.burger.id, self.lassi.id, self.cola.id})
+        self.assertEqual(self.ids(category_id=str(drinks)), {self.lassi.id, self.cola.id})
+        self.assertEqual(self.ids(category_id='junk'), set())
+        self.assertEqual(self.ids(min_price=Decimal('3.50'), max_price=Decimal('8')), {self.burger.id, self.lassi.id})
+        self.assertEqual(self.ids(keyword='yog'), {self.lassi.id})
+        self.assertEqual(self.ids(keyword='cold'), {self.lassi.id, self.cola.id})
+        self.assertEqual(self.ids(keyword='cold mango'), {self.lassi.id})
+        self.assertEqual(self.ids(category_id=drinks, max_price=Decimal('3'), keyword='drinks'), {self.cola.id})
+
+    def test_index_is_rebuilt_with_snapshot(self):
+        self.assertIs(get_menu_index(self.snapshot), get_menu_index(self.snapshot))
+        with self.captureOnCommitCallbacks(execute=True):
+            create_food(self.vendor, 'Cheese Burger')
+        index = get_menu_index(get_menu_snapshot(self.vendor.vendor_slug))
+        self.assertEqual(len(index), 4)
+
+    def test_filter_foods_queries(self):
+        self.client.force_login(self.vendor.user)
+        url = reverse('filter_foods', args=[self.vendor.vendor_slug])
+        self.client.get(url, headers={'x-requested-with': 'XMLHttpRequest'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'search': 'burger', 'min_price': 'abc'}, headers={'x-requested-with': 'XMLHttpRequest'})
+        cart_queries = [q for q in ctx.captured_queries if 'marketplace_cart' in q['sql']]
+        self.assertEqual(len(cart_queries), 1)
+        self.assertFalse([q for q in ctx.captured_queries if 'menu_fooditem' in q['sql']])
+        self.assertEqual(response.json()['count'], 1)
+
+
+class SearchRadiusTest(TestCase):
+
+    def set_location(self, vendor, latitude, longitude):
+        profile = vendor.user_profile
+        profile.latitude, profile.longitude = latitude, longitude
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+    def test_search_filters_and_sorts_by_distance(self):
+        self.set_location(create_vendor('gazipur'), '23.9999', '90.4203')
+        self.set_location(create_vendor('dhaka'), '23.8103', '90.4125')
+        self.set_location(create_vendor('chittagong'), '22.3569', '91.7832')
+        create_vendor('nowhere')
+
+        response = self.client.get(reverse('search'), {'address': 'Dhaka', 'lat': '23.81', 'lng': '90.41', 'radius': '25', 'keyword': ''})
+        vendors = response.context['vendors']
+        self.assertEqual([v.vendor_name for v in vendors], ['dhaka', 'gazipur'])
+        self.assertEqual(response.context['vendor_count'], 2)
+        self.assertLess(vendors[0].kms, vendors[1].kms)
+
+    def test_search_without_location_skips_radius(self):
+        create_vendor('dhaka')
+        response = self.client.get(reverse('search'), {'address': '', 'lat': '', 'lng': '', 'radius': '', 'keyword': 'dha'})
+        self.assertEqual(response.context['vendor_count'], 1)
+
+    def test_non_finite_location_skips_radius(self):
+        self.set_location(create_vendor('dhaka'), '23.8103', '90.4125')
+        for lat, radius in (('nan', '25'), ('23.81', 'inf')):
+            response = self.client.get(reverse('search'), {'address': 'x', 'lat': lat, 'lng': '90.41', 'radius': radius, 'keyword': ''})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(hasattr(response.context['vendors'][0], 'kms'))
+
+
+class SearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('spicehouse')
+        self.other = create_vendor('biryanihouse')
+        self.rice = Category.objects.create(vendor=self.vendor, category_name='Rice')
+        self.biryani = create_food(self.vendor, 'Chicken Biryani', self.rice, 'Basmati rice with chicken')
+        self.curry = create_food(self.vendor, 'Chicken Curry', description='Served with rice')
+        self.kacchi = create_food(self.other, 'Kacchi', description='Mutton biryani')
+
+    def test_ranking(self):
+        hits = search_index('biryani')
+        self.assertEqual(hits.food_ids, [self.biryani.id, self.kacchi.id])
+        # name match plus a food match ranks the second vendor first
+        self.assertEqual(hits.vendor_ids, [self.other.id, self.vendor.id])
+
+    def test_all_tokens_must_match_and_prefixes(self):
+        self.assertEqual(search_index('chick rice').food_ids, [self.biryani.id, self.curry.id])
+        self.assertEqual(search_index('chicken mutton').food_ids, [])
+        self.assertIsNone(search_index('  '))
+
+    def test_non_ascii_prefixes(self):
+        brulee = create_food(self.vendor, 'Crème brûlée')
+        self.assertEqual(search_index('crè brû').food_ids, [brulee.id])
+        self.assertEqual(search_index('brûl').food_ids, [brulee.id])
+
+    def test_vendor_scope(self):
+        self.assertEqual(search_index('biryani', vendor=self.other).food_ids, [self.kacchi.id])
+
+    def test_incremental_updates(self):
+        self.curry.food_title = 'Beef Curry'
+        self.curry.save()
+        self.assertNotIn(self.curry.id, search_index('chicken').food_ids)
+
+        self.rice.category_name = 'Polao'
+        self.rice.save()
+        self.assertEqual(search_index('polao').food_ids, [self.biryani.id])
+
+        self.biryani.is_available = False
+        self.biryani.save()
+        self.assertEqual(search_index('basmati').food_ids, [])
+
+        self.kacchi.delete()
+        self.assertEqual(search_index('mutton').food_ids, [])
+
+        self.other.vendor_name = 'Dhaba'
+        self.other.save()
+        self.assertEqual(search_index('dhaba').vendor_ids, [self.other.id])
+
+    def test_search_view_uses_index(self):
+        response = self.client.get(reverse('search'), {'address': '', 'lat': '', 'lng': '', 'radius': '', 'keyword': 'biryani'})
+        self.assertEqual([v.id for v in response.context['vendors']], [self.other.id, self.vendor.id])
+
+    def test_search_view_skips_unapproved_vendors(self):
+        create_vendor('biryanicorner', is_approved=False)
+        response = self.client.get(reverse('search'), {'address': '', 'lat': '', 'lng': '', 'radius': '', 'keyword': 'biryani'})
+        self.assertEqual([v.id for v in response.context['vendors']], [self.other.id, self.vendor.id])
+        self.assertEqual(response.context['vendor_count'], 2)
+
+    def test_vendor_detail_search(self):
+        response = self.client.get(reverse('vendor_detail', args=[self.vendor.vendor_slug]), {'search': 'rice'})
+        self.assertEqual([f['id'] for f in response.context['filtered_foods']], [self.biryani.id, self.curry.id])
+
+
+@tag('benchmark')
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class SearchIndexBenchmark(TestCase):
+    FOOD_COUNT = 100000
+    SYLLABLES = ['ka', 'chi', 'bir', 'ya', 'ni', 'tik', 'ma', 'sa', 'la', 'ke', 'bab', 'po', 'lao', 'naan', 'dal',
+                 'bhu', 'na', 'ko', 'rma', 'fry', 'rice', 'beef', 'fish', 'egg', 'mut', 'ton', 'pa', 'neer', 'chop', 'roll']
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        words = [a + b for a in cls.SYLLABLES for b in cls.SYLLABLES]
+        vendors = [create_vendor(f'benchvendor{i}') for i in range(20)]
+        categories = [Category.objects.create(vendor=vendor, category_name='Menu') for vendor in vendors]
+        foods = []
+        for i in range(cls.FOOD_COUNT):
+            title = ' '.join(rng.sample(words, 3))
+            description = ' '.join(rng.sample(words, 8))
+            foods.append(FoodItem(vendor=vendors[i % 20], category=categories[i % 20], food_title=title,
+                                  slug=f'bench-{i}', description=description, price='9.99', image='foodimages/food.jpg'))
+        FoodItem.objects.bulk_create(foods, batch_size=2000)
+        rows = []
+        for food in FoodItem.objects.filter(slug__startswith='bench-').iterator(chunk_size=2000):
+            for term, weight in fooditem_terms(food.food_title, food.description, 'Menu').items():
+                rows.append(SearchTerm(term=term, vendor_id=food.vendor_id, fooditem_id=food.id, weight=weight))
+        SearchTerm.objects.bulk_create(rows, batch_size=5000)
+
+    def timed(self, func, runs=5):
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = func()
+        return (time.perf_counter() - start) * 1000 / runs, result
+
+    def test_index_against_icontains(self):
+        for keyword in ['kachi', 'birya', 'tikma neer']:
+            icontains_ms, _ = self.timed(lambda: list(FoodItem.objects.filter(
+                Q(food_title__icontains=keyword) | Q(description__icontains=keyword), is_available=True
+            ).values_list('vendor', flat=True)))
+            index_ms, hits = self.timed(lambda: search_index(keyword))
+            print(f'\n{self.FOOD_COUNT} food items, {keyword!r}: icontains {icontains_ms:.1f} ms, '
+                  f'index {index_ms:.1f} ms ({len(hits.food_ids)} ranked hits)')
+            self.assertTrue(hits.food_ids)
+
+
+class KeysetPaginationTest(TestCase):
+
+    def test_pages_cover_every_vendor_once(self):
+        for i in range(5):
+            create_vendor(f'pagevendor{i}')
+        vendors = Vendor.objects.filter(is_approved=True)
+
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_paginate(vendors, cursor, page_size=2)
+            seen.extend(v.vendor_name for v in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [f'pagevendor{i}' for i in range(5)])
+
+        newest_first = keyset_paginate(vendors, page_size=2, descending=True)
+        self.assertEqual([v.vendor_name for v in newest_first.items], ['pagevendor4', 'pagevendor3'])
+
+    def test_invalid_cursor_starts_over(self):
+        create_vendor('pagevendor')
+        page = keyset_paginate(Vendor.objects.all(), 'not-a-cursor', page_size=2)
+        self.assertEqual(len(page.items), 1)
+        self.assertFalse(page.has_next)
+
+    def test_paginate_ids(self):
+        ranked = [(0.5, 5), (1.5, 3), (2.0, 9), (2.0, 11)]
+        first = paginate_ids(ranked, page_size=2)
+        self.assertEqual(first.items, [5, 3])
+        self.assertEqual(paginate_ids(ranked, first.next_cursor, page_size=2).items, [9, 11])
+        # the last vendor shown has dropped out of the new results
+        self.assertEqual(paginate_ids([(0.5, 5), (2.0, 9), (2.0, 11)], first.next_cursor, page_size=2).items, [9, 11])
+
+    def test_vendor_count_follows_activation(self):
+        vendor = create_vendor('countvendor')
+        response = self.client.get(reverse('marketplace'))
+        self.assertEqual(response.context['vendor_count'], 1)
+        vendor.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            vendor.user.save()
+        response = self.client.get(reverse('marketplace'))
+        self.assertEqual(response.context['vendor_count'], 0)
+
+    def test_listing_loads_vendor_cards_only(self):
+        create_vendor('cardvendor')
+        response = self.client.get(reverse('marketplace'))
+        vendor = response.context['vendors'][0]
+        self.assertEqual(vendor.get_deferred_fields(), {'user_id', 'vendor_license', 'is_approved', 'modified_at'})
+        self.assertIsNone(response.context['next_page_url'])
+
+
+class CartSummaryTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('cartvendor')
+        self.user = self.vendor.user
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+            Tax.objects.create(tax_type='Old', tax_percentage='5.00', is_active=False)
+        self.pizza = create_food(self.vendor, 'Pizza', price='12.50')
+        self.cola = create_food(self.vendor, 'Cola', price='2.00')
+
+    def test_totals(self):
+        Cart.objects.create(user=self.user, fooditem=self.pizza, quantity=2)
+        Cart.objects.create(user=self.user, fooditem=self.cola, quantity=3)
+        summary = build_cart_summary(self.user)
+        self.assertEqual(summary.cart_count, 5)
+        self.assertEqual(summary.subtotal, Decimal('31.00'))
+        self.assertEqual(summary.tax_dict, {'VAT': {'10.00': Decimal('3.10')}})
+        self.assertEqual(summary.grand_total, Decimal('34.10'))
+
+    def test_context_processors_are_lazy_and_memoized(self):
+        Cart.objects.create(user=self.user, fooditem=self.pizza, quantity=2)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        get_tax_rules()
+        with self.assertNumQueries(0):
+            counter = get_cart_counter(request)
+            amounts = get_cart_amounts(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(str(counter['cart_count']), '2')
+            self.assertEqual(str(amounts['grand_total']), '27.50')
+            self.assertIs(get_cart_summary(request), get_cart_summary(request))
+
+    def test_add_to_cart_response(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('add_to_cart', args=[self.pizza.id]), headers={'x-requested-with': 'XMLHttpRequest'})
+        data = response.json()
+        self.assertEqual(data['cart_counter'], {'cart_count': 1})
+        self.assertEqual(data['cart_amount']['grand_total'], '13.75')
+
+
+@tag('benchmark')
+class CartSummaryBenchmark(TestCase):
+
+    def test_query_count_is_constant(self):
+        vendor = create_vendor('benchcart')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+        for size in (1, 10, 100):
+            Cart.objects.filter(user=vendor.user).delete()
+            foods = [create_food(vendor, f'Item {size}-{i}') for i in range(size)]
+            Cart.objects.bulk_create([Cart(user=vendor.user, fooditem=food, quantity=2) for food in foods])
+            get_tax_rules()
+            start = time.perf_counter()
+            with self.assertNumQueries(1):
+                summary = build_cart_summary(vendor.user)
+            print(f'\ncart summary for {size} lines: {(time.perf_counter() - start) * 1000:.2f} ms')
+            self.assertEqual(summary.cart_count, size * 2)
+
+
+class TaxRuleCacheTest(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tax_rules()
+
+    def test_rules_are_cached_until_a_tax_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            vat = Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+        self.assertEqual(get_tax_rules(), (('VAT', Decimal('10.00')),))
+        with self.assertNumQueries(0):
+            rules = get_tax_rules()
+        self.assertIs(rules, get_tax_rules())
+
+        vat.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            vat.save()
+            # not before the change is committed
+            self.assertIs(get_tax_rules(), rules)
+        self.assertEqual(get_tax_rules(), ())
+        with self.captureOnCommitCallbacks(execute=True):
+            vat.delete()
+            Tax.objects.create(tax_type='GST', tax_percentage='5.00')
+        self.assertEqual(compute_tax(Decimal('20.00')), {'GST': {'5.00': Decimal('1.00')}})
+
+    def test_missing_version_reloads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+        rules = get_tax_rules()
+        # evicted from the shared cache, or bumped by a worker whose key
+        # this one never saw
+        cache.delete(TAX_RULES_VERSION_KEY)
+        # noticed on the next check of the shared key
+        self.assertIs(get_tax_rules(), rules)
+        with mock.patch('marketplace.taxes.TAX_RULES_CHECK_INTERVAL', 0):
+            self.assertIsNot(get_tax_rules(), rules)
+
+
+class CartMutationTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('mutvendor')
+        self.user = self.vendor.user
+        self.pizza = create_food(self.vendor, 'Pizza')
+
+    def test_increase_and_decrease(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(increase_cart_item(self.user, self.pizza.id), 1)
+        self.assertEqual(increase_cart_item(self.user, self.pizza.id), 2)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 2)
+        self.assertEqual(decrease_cart_item(self.user, self.pizza.id), 1)
+        self.assertEqual(decrease_cart_item(self.user, self.pizza.id), 0)
+        self.assertFalse(Cart.objects.exists())
+        self.assertIsNone(decrease_cart_item(self.user, self.pizza.id))
+        self.assertIsNone(increase_cart_item(self.user, self.pizza.id + 1000))
+        self.assertFalse(Cart.objects.exists())
+
+    def test_increase_stops_at_the_column_limit(self):
+        Cart.objects.create(user=self.user, fooditem=self.pizza, quantity=MAX_QUANTITY)
+        self.assertEqual(increase_cart_item(self.user, self.pizza.id), MAX_QUANTITY)
+
+    def test_one_row_per_item(self):
+        Cart.objects.create(user=self.user, fooditem=self.pizza, quantity=1)
+        with self.assertRaises(IntegrityError):
+            Cart.objects.create(user=self.user, fooditem=self.pizza, quantity=1)
+
+    def test_decrease_cart_view(self):
+        increase_cart_item(self.user, self.pizza.id)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('decrease_cart', args=[self.pizza.id]), headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(response.json()['qty'], 0)
+        self.assertEqual(response.json()['cart_counter'], {'cart_count': 0})
+
+
+class CartBatchTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('batchvendor')
+        self.user = self.vendor.user
+        self.pizza = create_food(self.vendor, 'Pizza', price='10.00')
+        self.cola = create_food(self.vendor, 'Cola', price='2.00')
+
+    def test_coalesce(self):
+        changes = coalesce_cart_operations([
+            {'food_id': 1, 'delta': 1}, {'food_id': '1', 'delta': 1}, {'food_id': 2, 'delta': 1},
+            {'food_id': 2, 'quantity': 5}, {'food_id': 2, 'delta': -1},
+        ])
+        self.assertEqual(changes, {1: ('delta', 2), 2: ('quantity', 4)})
+        for operation in ({'food_id': 10 ** 20, 'delta': 1}, {'food_id': 1, 'quantity': 10 ** 20},
+                          {'food_id': 1, 'delta': 1.9}, {'food_id': 1, 'quantity': -1}, {'food_id': True, 'delta': 1}):
+            with self.assertRaises(ValueError):
+                coalesce_cart_operations([operation])
+
+    def test_apply(self):
+        increase_cart_item(self.user, self.cola.id)
+        # foods, add, take away, delete emptied lines, read back (plus savepoint)
+        with self.assertNumQueries(7):
+            quantities = apply_cart_operations(self.user, [
+                {'food_id': self.pizza.id, 'delta': 1}, {'food_id': self.pizza.id, 'delta': 1},
+                {'food_id': self.cola.id, 'delta': -3}, {'food_id': self.pizza.id + 1000, 'delta': 1},
+            ])
+        self.assertEqual(quantities, {self.pizza.id: 2, self.cola.id: 0})
+        self.assertEqual(list(Cart.objects.values_list('fooditem_id', 'quantity')), [(self.pizza.id, 2)])
+        apply_cart_operations(self.user, [{'food_id': self.pizza.id, 'quantity': 7}])
+        self.assertEqual(Cart.objects.get().quantity, 7)
+        apply_cart_operations(self.user, [{'food_id': self.pizza.id, 'quantity': 0}])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_update_cart_view(self):
+        self.client.force_login(self.user)
+        url = reverse('update_cart')
+        body = '{"operations": [{"food_id": %d, "delta": 1}, {"food_id": %d, "delta": 1}]}' % (self.pizza.id, self.pizza.id)
+        response = self.client.post(url, body, content_type='application/json', headers={'x-requested-with': 'XMLHttpRequest'})
+        data = response.json()
+        self.assertEqual(data['quantities'], {str(self.pizza.id): 2})
+        self.assertEqual(data['cart_counter'], {'cart_count': 2})
+        self.assertEqual(data['cart_amount']['subtotal'], '20.00')
+
+        for operation in ('{"food_id": "x"}', '{"food_id": 1, "quantity": 100000000000000000000}',
+                          '{"food_id": 100000000000000000000, "delta": 1}', '{"food_id": %d, "delta": 1.9}' % self.pizza.id):
+            response = self.client.post(url, '{"operations": [%s]}' % operation, content_type='application/json', headers={'x-requested-with': 'XMLHttpRequest'})
+            self.assertEqual(response.json(), {'status': 'Failed', 'message': 'Invalid request!'})
+
+
+# SQLite serializes writers on a database lock, which the threads here trip
+# over ("database table is locked") before any lost update could show.
+@skipUnless(connection.vendor == 'postgresql', 'needs concurrent writers (PostgreSQL)')
+class CartConcurrencyTest(TransactionTestCase):
+
+    def hammer(self, func, user, fooditem_id, threads=8, per_thread=20):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    func(user, fooditem_id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual(errors, [])
+
+    def test_no_lost_updates(self):
+        vendor = create_vendor('racevendor')
+        pizza = create_food(vendor, 'Pizza')
+        self.hammer(increase_cart_item, vendor.user, pizza.id)
+        self.assertEqual(list(Cart.objects.values_list('quantity', flat=True)), [160])
+        self.hammer(decrease_cart_item, vendor.user, pizza.id, per_thread=15)
+        self.assertEqual(list(Cart.objects.values_list('quantity', flat=True)), [40])
+        self.hammer(decrease_cart_item, vendor.user, pizza.id, per_thread=10)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_batches_add_to_new_lines(self):
+        vendor = create_vendor('batchracevendor')
+        pizza = create_food(vendor, 'Pizza')
+        # every thread's first batch finds no line for the pizza
+        self.hammer(lambda user, food_id: apply_cart_operations(user, [{'food_id': food_id, 'delta': 1}]), vendor.user, pizza.id)
+        self.assertEqual(list(Cart.objects.values_list('quantity', flat=True)), [160])
@@ -0,0 +1,122 @@
+import json
+from bisect import bisect_right
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+VENDOR_PAGE_SIZE = 20
+VENDOR_COUNT_CACHE_KEY = 'marketplace_vendor_count'
+VENDOR_COUNT_TIMEOUT = 300
+
+# Everything a vendor card in listings.html / home.html reads
+VENDOR_CARD_FIELDS = (
+    'id', 'vendor_name', 'vendor_slug', 'opening_schedule', 'created_at', 'user_profile',
+    'user_profile__profile_picture', 'user_profile__profile_picture_derivatives', 'user_profile__address',
+    'user_profile__city', 'user_profile__devision', 'user_profile__pin_code',
+)
+
+
+def vendor_cards(queryset):
+    return queryset.select_related('user_profile').only(*VENDOR_CARD_FIELDS)
+
+
+def encode_cursor(*values):
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
+
+
+class Page:
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def keyset_paginate(queryset, cursor=None, page_size=VENDOR_PAGE_SIZE, descending=False):
+    """
+    One page of ``queryset`` ordered by ``(created_at, id)``.
+
+    The cursor carries the last row's key, so the next page is an index
+    range scan that costs the same on page 1 and on page 1000.
+    """
+    if descending:
+        queryset = queryset.order_by('-created_at', '-id')
+    else:
+        queryset = queryset.order_by('created_at', 'id')
+
+    values = decode_cursor(cursor)
+    if values and len(values) == 2:
+        try:
+            created_at, pk = datetime.fromisoformat(values[0]), int(values[1])
+        except (TypeError, ValueError):
+            pass
+        else:
+            if descending:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1].created_at.isoformat(), items[-1].id)
+    return Page(items, next_cursor)
+
+
+def paginate_ids(ranked, cursor=None, page_size=VENDOR_PAGE_SIZE):
+    """
+    One page of ids from ``ranked``, an ordering computed in memory (search
+    relevance or distance) as ``(sort_key, id)`` pairs sorted ascending.
+
+    The cursor carries the last pair shown, so the next page is found by
+    bisection and starts at the right place even if that vendor has since
+    dropped out of the results.
+    """
+    start = 0
+    values = decode_cursor(cursor)
+    if values and len(values) == 2:
+        try:
+            start = bisect_right(ranked, (float(values[0]), int(values[1])))
+        except (TypeError, ValueError):
+            pass
+    page = ranked[start:start + page_size]
+    next_cursor = None
+    if start + page_size < len(ranked):
+        next_cursor = encode_cursor(*page[-1])
+    return Page([pk for _, pk in page], next_cursor)
+
+
+def approved_vendor_count(queryset):
+    # The exact count is only used for the "N Restaurant's found" heading;
+    # the marketplace signals drop it when a vendor is saved, deleted or
+    # (de)activated, and the timeout bounds anything they miss.
+    return cache.get_or_set(VENDOR_COUNT_CACHE_KEY, queryset.count, VENDOR_COUNT_TIMEOUT)
+
+
+def invalidate_vendor_count():
+    transaction.on_commit(lambda: cache.delete(VENDOR_COUNT_CACHE_KEY))
+
+
+def next_page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return '?' + params.urlencode()
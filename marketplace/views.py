@@ -1,5 +1,4 @@
 from accounts.models import UserProfile
-from .context_processors import get_cart_counter, get_cart_amounts
 from menu.models import Category, FoodItem
 
 from vendor.models import OpeningHour, Vendor
@@ -14,54 +13,41 @@ from django.db.models import Q
 # from django.contrib.gis.db.models.functions import Distance
 
 from datetime import date, datetime
+from decimal import Decimal
 from orders.forms import OrderForm
+from django.http import Http404
+from django.views.decorators.csrf import ensure_csrf_cookie
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Min, Max
+from django.utils import timezone
+from .search import search_index
+from .snapshot import get_menu_snapshot
+from .menu_index import get_menu_index, parse_price
+from vendor.schedule import WeeklySchedule
 
 
 
-def marketplace(request):
-
-    vendors = Vendor.objects.filter( is_approved=True , user__is_active = True )
-    vendor_count = vendors.count()
-    context = {
-        'vendors': vendors,
-        'vendor_count': vendor_count,
-    }
-
-
-
-    return render(request, 'marketplace/listings.html', context)
-
-
+@ensure_csrf_cookie
 def vendor_detail(request, vendor_slug):
-    vendor = get_object_or_404(Vendor, vendor_slug=vendor_slug, is_approved=True, user__is_active=True)
+    snapshot = get_menu_snapshot(vendor_slug)
+    if snapshot is None:
+        raise Http404('No Vendor matches the given query.')
+    vendor = dict(snapshot['vendor'])
+    categories = snapshot['categories']
+    opening_hours = snapshot['opening_hours']
     
     # Get search query if provided
     search_query = request.GET.get('search', '').strip()
-    
-    # Get all categories for the vendor
-    categories = Category.objects.filter(vendor=vendor).prefetch_related(
-        Prefetch('fooditems', queryset=FoodItem.objects.filter(is_available=True))
-    )
 
-    opening_hours = OpeningHour.objects.filter( vendor = vendor ).order_by('day' , '-from_hour')
-
-    today_date = date.today()
-    today = today_date.isoweekday()
-
-    current_opening_hours = OpeningHour.objects.filter( vendor = vendor , day = today)
-    
-    # Get price range for filters
-    price_data = FoodItem.objects.filter(vendor=vendor, is_available=True).aggregate(
-        min_price=Min('price'),
-        max_price=Max('price')
-    )
-    min_price = price_data['min_price'] or 0
-    max_price = price_data['max_price'] or 0
+    # Open/close times come from the precomputed weekly schedule
+    schedule = WeeklySchedule.from_list(snapshot['opening_schedule'])
+    now = timezone.localtime()
+    today = now.isoweekday()
+    current_opening_hours = [hour for hour in opening_hours if hour['day'] == today]
+    vendor['is_open'] = schedule.is_open_at(now)
 
     if request.user.is_authenticated:
-        cart_items = Cart.objects.filter(user=request.user)
+        cart_items = Cart.objects.filter(user=request.user).values('fooditem_id', 'quantity')
     else:
         cart_items = None
     
@@ -71,22 +57,15 @@ def vendor_detail(request, vendor_slug):
     filtered_foods = None
     
     # If search query provided, filter foods across all categories
-    if search_query:
-        filtered_foods = FoodItem.objects.filter(
-            Q(vendor=vendor, is_available=True, food_title__icontains=search_query) | 
-            Q(vendor=vendor, is_available=True, description__icontains=search_query)
-        )
+    hits = search_index(search_query, vendor=vendor['id'])
+    if hits is not None:
+        foods = {food['id']: food for category in categories for food in category['fooditems']}
+        filtered_foods = [foods[pk] for pk in hits.food_ids if pk in foods]
     # If category filter provided, filter foods by category
     elif category_id:
-        try:
-            selected_category = Category.objects.get(id=category_id, vendor=vendor)
-            filtered_foods = FoodItem.objects.filter(
-                vendor=vendor, 
-                is_available=True, 
-                category=selected_category
-            )
-        except Category.DoesNotExist:
-            filtered_foods = None
+        selected_category = next((category for category in categories if str(category['id']) == category_id), None)
+        if selected_category is not None:
+            filtered_foods = selected_category['fooditems']
         
     context = {
         'vendor': vendor,
@@ -94,8 +73,10 @@ def vendor_detail(request, vendor_slug):
         'cart_items': cart_items,
         'opening_hours': opening_hours,
         'current_opening_hours': current_opening_hours,
-        'min_price': min_price,
-        'max_price': max_price,
+        'closes_at': schedule.closes_at(now),
+        'opens_next_at': schedule.opens_next_at(now),
+        'min_price': Decimal(snapshot['min_price']),
+        'max_price': Decimal(snapshot['max_price']),
         'search_query': search_query,
         'filtered_foods': filtered_foods,
         'selected_category': selected_category,
@@ -103,182 +84,69 @@ def vendor_detail(request, vendor_slug):
     return render(request, 'marketplace/vendor_detail.html', context)   
 
 
-def add_to_cart(request, food_id):
-    if request.user.is_authenticated:
-        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            # Check if the food item exists
-            try:
-                fooditem = FoodItem.objects.get(id=food_id)
-                # Check if the user has already added that food to the cart
-                try:
-                    chkCart = Cart.objects.get(user=request.user, fooditem=fooditem)
-                    # Increase the cart quantity
-                    chkCart.quantity += 1
-                    chkCart.save()
-                    return JsonResponse({'status': 'Success', 'message': 'Increased the cart quantity', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-                except:
-                    chkCart = Cart.objects.create(user=request.user, fooditem=fooditem, quantity=1)
-                    return JsonResponse({'status': 'Success', 'message': 'Added the product to the cart', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-            except:
-                return JsonResponse({'status': 'Failed', 'message': 'This product does not exist!'})
-        else:
-            return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
-        
-    else:
-        return JsonResponse({'status': 'login_required', 'message': 'Please login to continue'})
-
-
-
-
-def decrease_cart(request, food_id):
-    if request.user.is_authenticated:
-        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            # Check if the food item exists
-            try:
-                fooditem = FoodItem.objects.get(id=food_id)
-                # Check if the user has already added that food to the cart
-                try:
-                    chkCart = Cart.objects.get(user=request.user, fooditem=fooditem)
-                    if chkCart.quantity > 1:
-                        # decrease the cart quantity
-                        chkCart.quantity -= 1
-                        chkCart.save()
-                    else:
-                        chkCart.delete()
-                        chkCart.quantity = 0
-                    return JsonResponse({'status': 'Success', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-                except:
-                    return JsonResponse({'status': 'Failed', 'message': 'You do not have this item in your cart!'})
-            except:
-                return JsonResponse({'status': 'Failed', 'message': 'This food does not exist!'})
-        else:
-            return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
-        
-    else:
-        return JsonResponse({'status': 'login_required', 'message': 'Please login to continue'})
-    
-
-
-@login_required(login_url = 'login')
-def cart(request):
-    cart_items = Cart.objects.filter(user=request.user).order_by('created_at')
-    context = {
-        'cart_items': cart_items,
-    }
-    return render(request, 'marketplace/cart.html', context)
-
-    
-def delete_cart(request, cart_id):
-    if request.user.is_authenticated:
-        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            try:
-                # Check if the cart item exists
-                cart_item = Cart.objects.get(user=request.user, id=cart_id)
-                if cart_item:
-                    cart_item.delete()
-                    return JsonResponse({'status': 'Success', 'message': 'Cart item has been deleted!', 'cart_counter': get_cart_counter(request), 'cart_amount': get_cart_amounts(request)})
-            except:
-                return JsonResponse({'status': 'Failed', 'message': 'Cart Item does not exist!'})
-        else:
-            return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
-        
-
-
 @login_required(login_url='login')
 def filter_foods(request, vendor_slug):
     """Filter foods by category, price, and search query"""
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        vendor = get_object_or_404(Vendor, vendor_slug=vendor_slug, is_approved=True, user__is_active=True)
+        snapshot = get_menu_snapshot(vendor_slug)
+        if snapshot is None:
+            raise Http404('No Vendor matches the given query.')
         
         # Get filter parameters
         search_query = request.GET.get('search', '').strip()
         category_id = request.GET.get('category', '')
-        min_price = request.GET.get('min_price', '')
-        max_price = request.GET.get('max_price', '')
-        
-        # Start with all available food items for this vendor
-        foods = FoodItem.objects.filter(vendor=vendor, is_available=True)
-        
-        # Filter by category
-        if category_id and category_id != '':
-            foods = foods.filter(category_id=category_id)
-        
-        # Filter by search query (food title and description)
-        if search_query:
-            foods = foods.filter(
-                Q(food_title__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
-        
-        # Filter by price range
-        if min_price:
-            try:
-                foods = foods.filter(price__gte=Decimal(min_price))
-            except:
-                pass
-        
-        if max_price:
-            try:
-                foods = foods.filter(price__lte=Decimal(max_price))
-            except:
-                pass
+        min_price = parse_price(request.GET.get('min_price', ''))
+        max_price = parse_price(request.GET.get('max_price', ''))
+
+        # Category, price range and text filters in one pass over the menu index
+        foods = get_menu_index(snapshot).filter(
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            keyword=search_query,
+        )
         
         # Get cart items for display
         if request.user.is_authenticated:
-            cart_items = Cart.objects.filter(user=request.user).values_list('fooditem_id', flat=True)
+            cart_items = set(Cart.objects.filter(user=request.user).values_list('fooditem_id', flat=True))
         else:
-            cart_items = []
+            cart_items = set()
         
         # Prepare response data
         foods_data = []
         for food in foods:
             foods_data.append({
-                'id': food.id,
-                'title': food.food_title,
-                'price': str(food.price),
-                'description': food.description,
-                'image': food.image.url,
-                'in_cart': food.id in cart_items,
+                'id': food['id'],
+                'title': food['food_title'],
+                'price': food['price'],
+                'description': food['description'],
+                'image': food['image_thumb_url'],
+                'in_cart': food['id'] in cart_items,
             })
         
         return JsonResponse({
             'status': 'success',
             'foods': foods_data,
-            'count': foods.count()
+            'count': len(foods_data)
         })
     
     return JsonResponse({'status': 'failed', 'message': 'Invalid request'})
 
 
-def search(request):
-    if not 'keyword' in request.GET:
-        return redirect('marketplace')
-
-    keyword = request.GET['keyword']
-    
-    # get vendor ids that has the food item the user is looking for
-    fetch_vendors_by_fooditems = FoodItem.objects.filter(food_title__icontains=keyword, is_available=True).values_list('vendor', flat=True)
-    
-    vendors = Vendor.objects.filter(Q(id__in=fetch_vendors_by_fooditems) | Q(vendor_name__icontains=keyword, is_approved=True, user__is_active=True))
-
-    vendor_count = vendors.count()
-    context = {
-        'vendors': vendors,
-        'vendor_count': vendor_count,
-    }
-
-    return render(request, 'marketplace/listings.html', context)
-
-
+import json
+import math
 
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
 from accounts.models import UserProfile
-from .context_processors import get_cart_counter, get_cart_amounts
+from .cart import MAX_CART_OPERATIONS, apply_cart_operations, decrease_cart_item, get_cart_summary, increase_cart_item
 from menu.models import Category, FoodItem
 
 from vendor.models import OpeningHour, Vendor
+from vendor.utils import attach_open_status
+from vendor.geo import get_vendor_geo_index
+from .utils import approved_vendor_count, keyset_paginate, next_page_url, paginate_ids, vendor_cards
 from django.db.models import Prefetch
 from .models import Cart
 from django.contrib.auth.decorators import login_required
@@ -295,63 +163,24 @@ from orders.forms import OrderForm
 
 def marketplace(request):
     vendors = Vendor.objects.filter(is_approved=True, user__is_active=True)
-    vendor_count = vendors.count()
+    page = keyset_paginate(vendor_cards(vendors), request.GET.get('cursor'))
     context = {
-        'vendors': vendors,
-        'vendor_count': vendor_count,
+        'vendors': attach_open_status(page.items),
+        'vendor_count': approved_vendor_count(vendors),
+        'next_page_url': next_page_url(request, page.next_cursor),
     }
     return render(request, 'marketplace/listings.html', context)
 
 
-def vendor_detail(request, vendor_slug):
-    vendor = get_object_or_404(Vendor, vendor_slug=vendor_slug)
-
-    categories = Category.objects.filter(vendor=vendor).prefetch_related(
-        Prefetch(
-            'fooditems',
-            queryset = FoodItem.objects.filter(is_available=True)
-        )
-    )
-
-    opening_hours = OpeningHour.objects.filter(vendor=vendor).order_by('day', 'from_hour')
-    
-    # Check current day's opening hours.
-    today_date = date.today()
-    today = today_date.isoweekday()
-    
-    current_opening_hours = OpeningHour.objects.filter(vendor=vendor, day=today)
-    if request.user.is_authenticated:
-        cart_items = Cart.objects.filter(user=request.user)
-    else:
-        cart_items = None
-    context = {
-        'vendor': vendor,
-        'categories': categories,
-        'cart_items': cart_items,
-        'opening_hours': opening_hours,
-        'current_opening_hours': current_opening_hours,
-    }
-    return render(request, 'marketplace/vendor_detail.html', context)
-
-
 def add_to_cart(request, food_id):
     if request.user.is_authenticated:
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            # Check if the food item exists
-            try:
-                fooditem = FoodItem.objects.get(id=food_id)
-                # Check if the user has already added that food to the cart
-                try:
-                    chkCart = Cart.objects.get(user=request.user, fooditem=fooditem)
-                    # Increase the cart quantity
-                    chkCart.quantity += 1
-                    chkCart.save()
-                    return JsonResponse({'status': 'Success', 'message': 'Increased the cart quantity', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-                except:
-                    chkCart = Cart.objects.create(user=request.user, fooditem=fooditem, quantity=1)
-                    return JsonResponse({'status': 'Success', 'message': 'Added the food to the cart', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-            except:
+            quantity = increase_cart_item(request.user, food_id)
+            if quantity is None:
                 return JsonResponse({'status': 'Failed', 'message': 'This food does not exist!'})
+            summary = get_cart_summary(request, refresh=True)
+            message = 'Added the food to the cart' if quantity == 1 else 'Increased the cart quantity'
+            return JsonResponse({'status': 'Success', 'message': message, 'cart_counter': summary.as_counter(), 'qty': quantity, 'cart_amount': summary.as_amounts()})
         else:
             return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
         
@@ -362,24 +191,11 @@ def add_to_cart(request, food_id):
 def decrease_cart(request, food_id):
     if request.user.is_authenticated:
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            # Check if the food item exists
-            try:
-                fooditem = FoodItem.objects.get(id=food_id)
-                # Check if the user has already added that food to the cart
-                try:
-                    chkCart = Cart.objects.get(user=request.user, fooditem=fooditem)
-                    if chkCart.quantity > 1:
-                        # decrease the cart quantity
-                        chkCart.quantity -= 1
-                        chkCart.save()
-                    else:
-                        chkCart.delete()
-                        chkCart.quantity = 0
-                    return JsonResponse({'status': 'Success', 'cart_counter': get_cart_counter(request), 'qty': chkCart.quantity, 'cart_amount': get_cart_amounts(request)})
-                except:
-                    return JsonResponse({'status': 'Failed', 'message': 'You do not have this item in your cart!'})
-            except:
-                return JsonResponse({'status': 'Failed', 'message': 'This food does not exist!'})
+            quantity = decrease_cart_item(request.user, food_id)
+            if quantity is None:
+                return JsonResponse({'status': 'Failed', 'message': 'You do not have this item in your cart!'})
+            summary = get_cart_summary(request, refresh=True)
+            return JsonResponse({'status': 'Success', 'cart_counter': summary.as_counter(), 'qty': quantity, 'cart_amount': summary.as_amounts()})
         else:
             return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
         
@@ -388,8 +204,9 @@ def decrease_cart(request, food_id):
 
 
 @login_required(login_url = 'login')
+@ensure_csrf_cookie
 def cart(request):
-    cart_items = Cart.objects.filter(user=request.user).order_by('created_at')
+    cart_items = Cart.objects.filter(user=request.user).select_related('fooditem__vendor').order_by('created_at')
     context = {
         'cart_items': cart_items,
     }
@@ -399,16 +216,32 @@ def cart(request):
 def delete_cart(request, cart_id):
     if request.user.is_authenticated:
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            try:
-                # Check if the cart item exists
-                cart_item = Cart.objects.get(user=request.user, id=cart_id)
-                if cart_item:
-                    cart_item.delete()
-                    return JsonResponse({'status': 'Success', 'message': 'Cart item has been deleted!', 'cart_counter': get_cart_counter(request), 'cart_amount': get_cart_amounts(request)})
-            except:
+            deleted, _ = Cart.objects.filter(user=request.user, id=cart_id).delete()
+            if not deleted:
                 return JsonResponse({'status': 'Failed', 'message': 'Cart Item does not exist!'})
+            summary = get_cart_summary(request, refresh=True)
+            return JsonResponse({'status': 'Success', 'message': 'Cart item has been deleted!', 'cart_counter': summary.as_counter(), 'cart_amount': summary.as_amounts()})
         else:
             return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
+    else:
+        return JsonResponse({'status': 'login_required', 'message': 'Please login to continue'})
+
+
+def update_cart(request):
+    # Batched quantity changes from the cart buttons, see custom.js
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'login_required', 'message': 'Please login to continue'})
+    if request.method != 'POST' or request.headers.get('x-requested-with') != 'XMLHttpRequest':
+        return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
+    try:
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list) or len(operations) > MAX_CART_OPERATIONS:
+            raise ValueError
+        quantities = apply_cart_operations(request.user, operations)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'status': 'Failed', 'message': 'Invalid request!'})
+    summary = get_cart_summary(request, refresh=True)
+    return JsonResponse({'status': 'Success', 'quantities': quantities, 'cart_counter': summary.as_counter(), 'cart_amount': summary.as_amounts()})
 
 
 def search(request):
@@ -421,17 +254,55 @@ def search(request):
         radius = request.GET['radius']
         keyword = request.GET['keyword']
 
-        # get vendor ids that has the food item the user is looking for
-        fetch_vendors_by_fooditems = FoodItem.objects.filter(food_title__icontains=keyword, is_available=True).values_list('vendor', flat=True)
-        
-        vendors = Vendor.objects.filter(Q(id__in=fetch_vendors_by_fooditems) | Q(vendor_name__icontains=keyword, is_approved=True, user__is_active=True))
-        # Note: Distance-based filtering disabled due to GDAL dependency issues
-        # If radius is needed, consider using a different geo library or external service
-        vendor_count = vendors.count()
+        cursor = request.GET.get('cursor')
+        vendors = Vendor.objects.filter(is_approved=True, user__is_active=True)
+
+        # vendors whose name or menu matches the keyword, best match first
+        hits = search_index(keyword, vendors=vendors)
+
+        # Radius search runs on the in-memory vendor geo index (no GDAL/PostGIS)
+        distances = None
+        try:
+            latitude, longitude, radius = float(latitude), float(longitude), float(radius)
+            # nan and inf parse as floats but would poison the distance math
+            if not all(math.isfinite(value) for value in (latitude, longitude, radius)):
+                raise ValueError
+        except ValueError:
+            pass
+        else:
+            distances = dict(get_vendor_geo_index().within(latitude, longitude, radius))
+
+        if hits is None and distances is None:
+            page = keyset_paginate(vendor_cards(vendors), cursor)
+            vendor_count = approved_vendor_count(vendors)
+            vendors = page.items
+        else:
+            # nearest first when searching by location, otherwise by relevance
+            if distances is not None:
+                ranked = [(km, pk) for pk, km in distances.items()]
+                if hits is not None:
+                    ranked = [(km, pk) for km, pk in ranked if pk in hits.vendor_scores]
+            else:
+                ranked = [(-score, pk) for pk, score in hits.vendor_scores.items()]
+            ranked.sort()
+
+            # both rankings hold approved vendors only; the page itself is
+            # checked again in case one was unapproved since the geo index
+            # was built
+            page = paginate_ids(ranked, cursor)
+            cards = vendor_cards(vendors).in_bulk(page.items)
+            vendors = [cards[pk] for pk in page.items if pk in cards]
+            vendor_count = len(ranked)
+
+        vendors = attach_open_status(vendors)
+        if distances is not None:
+            for vendor in vendors:
+                vendor.kms = round(distances[vendor.id], 1)
         context = {
             'vendors': vendors,
             'vendor_count': vendor_count,
             'source_location': address,
+            'next_page_url': next_page_url(request, page.next_cursor),
         }
 
 
@@ -18,4 +18,44 @@ class FoodItemForm(forms.ModelForm):
     image = forms.FileField(widget=forms.FileInput(attrs={'class': 'btn btn-info w-100'}), validators=[allow_only_images_validator])
     class Meta:
         model = FoodItem
-        fields = ['category', 'food_title', 'description', 'price', 'image', 'is_available']
\ No newline at end of file
+        fields = ['category', 'food_title', 'description', 'price', 'image', 'is_available']
+
+
+
+class MenuImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON with category, food_title, description, price, is_available and image columns.')
+
+
+
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'no', 'n')
+
+
+class FoodItemImportForm(forms.Form):
+    # one row of a bulk menu import (see menu.utils.import_menu)
+    category = forms.CharField(max_length=50)
+    food_title = forms.CharField(max_length=100)
+    description = forms.CharField(max_length=500, required=False)
+    price = forms.DecimalField(max_digits=8, decimal_places=2, min_value=0)
+    is_available = forms.CharField(required=False)
+    image = forms.CharField(max_length=100, required=False)
+
+    def clean_category(self):
+        # same normalization as Category.clean
+        return self.cleaned_data['category'].capitalize()
+
+    def clean_is_available(self):
+        value = self.cleaned_data['is_available'].strip().lower()
+        if not value or value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise forms.ValidationError('Use true or false.')
+
+    def clean_image(self):
+        # a food image already in media storage, e.g. from an export
+        image = self.cleaned_data['image'].strip()
+        if image and (not image.startswith('foodimages/') or '..' in image.split('/')):
+            raise forms.ValidationError('Must be a path inside the foodimages folder.')
+        return image
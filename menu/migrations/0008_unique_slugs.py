@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:08
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def _renumber(model, name_field, default):
+    # Give every row after the first with a given slug (and every row with
+    # no slug) the next free base-N slug, so the unique index can be built.
+    taken = set()
+    for row in model.objects.order_by('id').only('id', 'slug', name_field).iterator():
+        if row.slug and row.slug not in taken:
+            taken.add(row.slug)
+            continue
+        base = slugify(getattr(row, name_field)) or default
+        slug, counter = base, 1
+        while slug in taken or model.objects.filter(slug=slug).exclude(id=row.id).exists():
+            slug = f'{base}-{counter}'
+            counter += 1
+        model.objects.filter(id=row.id).update(slug=slug)
+        taken.add(slug)
+
+
+def make_slugs_unique(apps, schema_editor):
+    _renumber(apps.get_model('menu', 'Category'), 'category_name', 'category')
+    _renumber(apps.get_model('menu', 'FoodItem'), 'food_title', 'food')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0007_alter_fooditem_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_slugs_unique, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='fooditem',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=150, unique=True),
+        ),
+    ]
@@ -1,11 +1,12 @@
 from django.db import models
-from django.utils.text import slugify
+from accounts.derivatives import ImageVariants
 from vendor.models import Vendor
+from .slugs import save_with_slug
 
 class Category(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
     category_name = models.CharField(max_length=50)
-    slug = models.SlugField(max_length=100, blank=True)
+    slug = models.SlugField(max_length=100, blank=True, unique=True)
     description = models.TextField(max_length=250, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -21,16 +22,11 @@ class Category(models.Model):
         self.category_name = self.category_name.capitalize()
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.category_name)
-            slug = base_slug
-            counter = 1
-            # ensure slug is unique globally
-            while Category.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            # slugs are unique globally
+            save_with_slug(self, self.category_name, lambda: super(Category, self).save(*args, **kwargs), default='category')
 
     def __str__(self):
         return self.category_name
@@ -40,24 +36,25 @@ class FoodItem(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE , related_name='fooditems') 
     food_title = models.CharField(max_length=100)
-    slug = models.SlugField(max_length=150,blank=True)
+    slug = models.SlugField(max_length=150, blank=True, unique=True)
     description = models.TextField(max_length=500, blank=True, null=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to='foodimages')
+    # resized copies written by accounts.images, see image_variants
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.food_title)
-            slug = base_slug
-            counter = 1
-            while FoodItem.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_slug(self, self.food_title, lambda: super(FoodItem, self).save(*args, **kwargs), default='food')
+
+    @property
+    def image_variants(self):
+        return ImageVariants(self.image, self.image_derivatives)
 
     def __str__(self):
         return self.food_title
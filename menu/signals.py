@@ -0,0 +1,5 @@
+from accounts.images import track_image_field
+from .models import FoodItem
+
+
+track_image_field(FoodItem, 'image')
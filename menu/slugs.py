@@ -0,0 +1,67 @@
+import operator
+import re
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+# base slugs looked up per query; SQLite caps the depth of an OR chain
+SLUG_LOOKUP_BATCH = 250
+# attempts at saving when a concurrent insert takes the slug picked
+MAX_SLUG_ATTEMPTS = 5
+
+
+def allocate_slugs(model, names, default='item'):
+    """
+    Unique slugs for new ``model`` rows named ``names``, in order.
+
+    Existing ``base`` and ``base-N`` slugs are read with one query
+    per SLUG_LOOKUP_BATCH distinct bases and the next free suffix is picked
+    in memory, so names repeated within ``names`` get distinct slugs too.
+    The slug column's unique index catches concurrent inserts; callers
+    retry on IntegrityError (see save_with_slug).
+    """
+    bases = [slugify(name) or default for name in names]
+    distinct = list(dict.fromkeys(bases))
+    taken = set()
+    for start in range(0, len(distinct), SLUG_LOOKUP_BATCH):
+        chunk = distinct[start:start + SLUG_LOOKUP_BATCH]
+        # only numeric suffixes: "chicken" must not load every
+        # "chicken-biryani-*"; the prefix keeps the slug index usable
+        lookup = reduce(operator.or_, [
+            Q(slug=base) | Q(slug__startswith=f'{base}-', slug__regex=rf'^{re.escape(base)}-[0-9]+$') for base in chunk
+        ])
+        taken.update(model.objects.filter(lookup).values_list('slug', flat=True))
+
+    counters = {}
+    slugs = []
+    for base in bases:
+        slug = base
+        counter = counters.get(base, 1)
+        while slug in taken:
+            slug = f'{base}-{counter}'
+            counter += 1
+        counters[base] = counter
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_slug(instance, name, save, default='item'):
+    """
+    Save a new ``instance`` through ``save`` with a free slug made from
+    ``name``, picking again if a concurrent insert took it first.
+    """
+    model = type(instance)
+    for attempt in range(MAX_SLUG_ATTEMPTS):
+        instance.slug = allocate_slugs(model, [name], default=default)[0]
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            taken = model.objects.filter(slug=instance.slug).exists()
+            if not taken or attempt == MAX_SLUG_ATTEMPTS - 1:
+                raise
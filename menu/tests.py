@@ -1,3 +1,154 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from marketplace.models import SearchTerm
+from marketplace.tests import create_food, create_vendor
+from .models import Category, FoodItem
+from .slugs import allocate_slugs
+from .utils import MenuImportError, export_menu_csv, import_menu, read_menu_file
+
+
+class AllocateSlugsTest(TestCase):
+
+    def test_skips_taken_suffixes(self):
+        vendor = create_vendor('slugvendor')
+        category = Category.objects.create(vendor=vendor, category_name='Rice')
+        for slug in ('biryani', 'biryani-1', 'biryani-3', 'biryani-special'):
+            FoodItem.objects.create(vendor=vendor, category=category, food_title='x', slug=slug, price='1.00')
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(FoodItem, ['Biryani', 'Biryani', 'Naan', 'Biryani'])
+        self.assertEqual(slugs, ['biryani-2', 'biryani-4', 'naan', 'biryani-5'])
+
+    def test_longer_slugs_are_not_loaded(self):
+        vendor = create_vendor('chickenvendor')
+        category = Category.objects.create(vendor=vendor, category_name='Rice')
+        for slug in ('chicken', 'chicken-2', 'chicken-tikka', 'chicken-tikka-1', 'chicken-1a'):
+            FoodItem.objects.create(vendor=vendor, category=category, food_title='x', slug=slug, price='1.00')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(allocate_slugs(FoodItem, ['Chicken', 'Chicken', 'Chicken']), ['chicken-1', 'chicken-3', 'chicken-4'])
+        self.assertEqual(len(ctx), 1)
+
+    def test_save_reads_existing_slugs_once(self):
+        vendor = create_vendor('biryanivendor')
+        category = Category.objects.create(vendor=vendor, category_name='Rice')
+        FoodItem.objects.bulk_create([
+            FoodItem(vendor=vendor, category=category, food_title='Chicken biryani', slug=f'chicken-biryani-{i}' if i else 'chicken-biryani', price='5.00')
+            for i in range(500)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            food = FoodItem.objects.create(vendor=vendor, category=category, food_title='Chicken Biryani', price='5.00')
+        self.assertEqual(food.slug, 'chicken-biryani-500')
+        # one prefix query; the other SELECTs come from post_save receivers
+        slug_queries = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT "menu_fooditem"."slug"')]
+        self.assertEqual(len(slug_queries), 1)
+
+    def test_save_retries_when_a_concurrent_insert_takes_the_slug(self):
+        vendor = create_vendor('racevendor')
+        Category.objects.create(vendor=vendor, category_name='Soups')
+        # the first pick is made before the other insert is visible
+        with mock.patch('menu.slugs.allocate_slugs', side_effect=[['soups'], ['soups-1']]) as allocate:
+            category = Category.objects.create(vendor=create_vendor('othervendor'), category_name='Soups')
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(category.slug, 'soups-1')
+
+    def test_views_keep_allocated_slug(self):
+        Category.objects.create(vendor=create_vendor('firstsoups'), category_name='Soups')
+        vendor = create_vendor('secondsoups')
+        self.client.force_login(vendor.user)
+        self.client.post(reverse('add_category'), {'category_name': 'soups', 'description': ''})
+        category = Category.objects.get(vendor=vendor)
+        self.assertEqual(category.slug, 'soups-1')
+        self.client.post(reverse('edit_category', args=[category.pk]), {'category_name': 'Soups', 'description': 'Hot'})
+        category.refresh_from_db()
+        self.assertEqual(category.slug, 'soups-1')
+
+
+class MenuImportTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('importvendor')
+        self.soup = create_food(self.vendor, 'Tomato soup', category=Category.objects.create(vendor=self.vendor, category_name='Soups'))
+
+    def rows(self, count):
+        return [
+            {'category': f'category {i % 10}', 'food_title': f'Dish {i}', 'description': 'Spicy', 'price': '4.50'}
+            for i in range(count)
+        ]
+
+    def test_import_is_a_handful_of_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_menu(self.vendor, self.rows(1000))
+        # the vendor lock, categories, category slugs, existing foods and four
+        # batches of food slugs; everything else is multi-row INSERTs (SQLite
+        # splits them by its bound variable limit)
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 8)
+        self.assertLess(len(ctx.captured_queries), 60)
+        self.assertEqual((result.created, result.updated, result.categories_created), (1000, 0, 10))
+        self.assertEqual(FoodItem.objects.filter(vendor=self.vendor).count(), 1001)
+        self.assertEqual(len(set(FoodItem.objects.values_list('slug', flat=True))), 1001)
+        self.assertTrue(SearchTerm.objects.filter(term='spicy', fooditem__food_title='Dish 999').exists())
+
+    def test_existing_items_are_updated(self):
+        result = import_menu(self.vendor, [
+            {'category': 'soups', 'food_title': 'Tomato soup', 'price': '6.00', 'is_available': 'false'},
+            {'category': 'Soups', 'food_title': 'Onion soup', 'price': '5.00'},
+        ])
+        self.assertEqual((result.created, result.updated, result.categories_created), (1, 1, 0))
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.price, Decimal('6.00'))
+        self.assertFalse(self.soup.is_available)
+
+    def test_invalid_rows_import_nothing(self):
+        with self.assertRaises(MenuImportError) as raised:
+            import_menu(self.vendor, [
+                {'category': 'Soups', 'food_title': 'Pea soup', 'price': '3.00'},
+                {'category': 'Soups', 'food_title': '', 'price': 'cheap'},
+            ])
+        self.assertEqual(len(raised.exception.errors), 2)
+        self.assertTrue(all(error.startswith('Row 2') for error in raised.exception.errors))
+        self.assertFalse(FoodItem.objects.filter(food_title='Pea soup').exists())
+
+    def test_extra_cells_are_rejected(self):
+        upload = SimpleUploadedFile('menu.csv', b'category,food_title,price\nSoup,Tomato,3,EXTRA\n')
+        with self.assertRaises(MenuImportError) as raised:
+            read_menu_file(upload)
+        self.assertEqual(raised.exception.errors, ['Row 1 has more cells than the header.'])
+
+    def test_images_are_limited_to_own_items(self):
+        other = create_food(create_vendor('otherimages'), 'Secret soup')
+        FoodItem.objects.filter(pk=other.pk).update(image='foodimages/secret.jpg')
+        for image in ('users/profile_pictures/ann.jpg', '../settings.py', 'foodimages/secret.jpg'):
+            with self.assertRaises(MenuImportError) as raised:
+                import_menu(self.vendor, [{'category': 'Soups', 'food_title': 'Pea soup', 'price': '3.00', 'image': image}])
+            self.assertTrue(raised.exception.errors[0].startswith('Row 1, image'))
+        result = import_menu(self.vendor, [{'category': 'Soups', 'food_title': 'Pea soup', 'price': '3.00', 'image': self.soup.image.name}])
+        self.assertEqual(result.created, 1)
+
+    def test_export_round_trip(self):
+        exported = ''.join(export_menu_csv(self.vendor))
+        rows = list(csv.DictReader(io.StringIO(exported)))
+        self.assertEqual(rows[0]['food_title'], 'Tomato soup')
+        upload = SimpleUploadedFile('menu.csv', exported.encode())
+        result = import_menu(self.vendor, read_menu_file(upload))
+        self.assertEqual((result.created, result.updated), (0, 1))
+
+    def test_views(self):
+        self.client.force_login(self.vendor.user)
+        upload = SimpleUploadedFile('menu.json', json.dumps([{'category': 'Drinks', 'food_title': 'Tea', 'price': 2}]).encode())
+        response = self.client.post(reverse('import_menu_items'), {'file': upload})
+        self.assertRedirects(response, reverse('menu_builder'), fetch_redirect_response=False)
+        self.assertTrue(FoodItem.objects.filter(vendor=self.vendor, food_title='Tea', category__category_name='Drinks').exists())
 
-# Create your tests here.
+        response = self.client.get(reverse('export_menu_items'), {'format': 'json'})
+        items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['food_title'] for item in items], ['Tea', 'Tomato soup'])
@@ -0,0 +1,212 @@
+import csv
+import io
+import json
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from accounts.images import queue_image_jobs
+from marketplace.search import index_fooditems
+from marketplace.snapshot import invalidate_menu_snapshot
+from vendor.models import Vendor
+from .forms import FoodItemImportForm
+from .models import Category, FoodItem
+from .slugs import MAX_SLUG_ATTEMPTS, allocate_slugs
+
+
+MAX_IMPORT_ROWS = 5000
+# where csv.DictReader puts cells beyond the header
+EXTRA_CELLS = object()
+EXPORT_FIELDS = ('category', 'food_title', 'description', 'price', 'is_available', 'image')
+
+
+class MenuImportError(Exception):
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class MenuImportResult:
+    def __init__(self, created, updated, categories_created):
+        self.created = created
+        self.updated = updated
+        self.categories_created = categories_created
+
+
+def read_menu_file(upload):
+    """Rows of an uploaded ``.csv`` or ``.json`` menu file as dicts."""
+    name = upload.name.lower()
+    try:
+        if name.endswith('.csv'):
+            text = io.TextIOWrapper(upload, encoding='utf-8-sig')
+            rows = []
+            for number, row in enumerate(csv.DictReader(text, restkey=EXTRA_CELLS), start=1):
+                if EXTRA_CELLS in row:
+                    raise MenuImportError([f'Row {number} has more cells than the header.'])
+                rows.append({key.strip().lower(): (value or '').strip() for key, value in row.items()})
+            return rows
+        if name.endswith('.json'):
+            rows = json.load(upload)
+            if isinstance(rows, dict):
+                rows = rows.get('items')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise MenuImportError(['A JSON menu must be a list of items.'])
+            return [{key: '' if value is None else str(value) for key, value in row.items()} for row in rows]
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise MenuImportError([f'Could not read {upload.name}: {e}'])
+    raise MenuImportError(['Upload a .csv or .json file.'])
+
+
+def _clean_rows(vendor, rows):
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise MenuImportError([f'A menu import can have at most {MAX_IMPORT_ROWS} items.'])
+    cleaned = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        form = FoodItemImportForm(row)
+        if form.is_valid():
+            cleaned.append(form.cleaned_data)
+        else:
+            for field, messages in form.errors.items():
+                errors.extend(f'Row {number}, {field}: {message}' for message in messages)
+    if errors:
+        raise MenuImportError(errors)
+
+    # images can't be uploaded with the menu, only reused: keep them to
+    # files already on this vendor's items
+    images = {row['image'] for row in cleaned if row['image']}
+    if images:
+        own = set(FoodItem.objects.filter(vendor=vendor, image__in=images).values_list('image', flat=True))
+        errors = [
+            f'Row {number}, image: Not an image of one of your items.'
+            for number, row in enumerate(cleaned, start=1) if row['image'] and row['image'] not in own
+        ]
+        if errors:
+            raise MenuImportError(errors)
+    return cleaned
+
+
+def import_menu(vendor, rows):
+    """
+    Add ``rows`` to ``vendor``'s menu, all or nothing.
+
+    Missing categories are created; an item whose title already exists in
+    its category is updated, any other is created. Everything is written
+    with bulk queries in one transaction, so the number of queries does
+    not grow with the number of rows. Raises MenuImportError listing the
+    invalid rows.
+    """
+    cleaned = _clean_rows(vendor, rows)
+    for attempt in range(MAX_SLUG_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                # imports into one vendor's menu take turns, so two of them
+                # never both create the same category or item
+                Vendor.objects.select_for_update().filter(pk=vendor.pk).exists()
+                result = _write_menu(vendor, cleaned)
+            break
+        except IntegrityError:
+            # slugs are unique across vendors: another vendor's insert took
+            # one of those picked; start over from what is in the database now
+            if attempt == MAX_SLUG_ATTEMPTS - 1:
+                raise
+    invalidate_menu_snapshot(vendor.vendor_slug)
+    return result
+
+
+def _write_menu(vendor, cleaned):
+    names = list(dict.fromkeys(row['category'] for row in cleaned))
+    categories = {
+        category.category_name: category
+        for category in Category.objects.filter(vendor=vendor, category_name__in=names)
+    }
+    missing = [name for name in names if name not in categories]
+    new_categories = [
+        Category(vendor=vendor, category_name=name, slug=slug)
+        for name, slug in zip(missing, allocate_slugs(Category, missing, default='category'))
+    ]
+    Category.objects.bulk_create(new_categories)
+    categories.update((category.category_name, category) for category in new_categories)
+
+    foods = {
+        (food.category_id, food.food_title): food
+        for food in FoodItem.objects.filter(
+            vendor=vendor,
+            category__in=list(categories.values()),
+            food_title__in={row['food_title'] for row in cleaned},
+        )
+    }
+    now = timezone.now()
+    created = []
+    updated = {}
+    new_images = {}
+    for row in cleaned:
+        category = categories[row['category']]
+        key = (category.id, row['food_title'])
+        food = foods.get(key)
+        if food is None:
+            food = foods[key] = FoodItem(vendor=vendor, category=category, food_title=row['food_title'], image='')
+            created.append(food)
+        elif food.pk:
+            food.category = category
+            updated[food.pk] = food
+        food.description = row['description']
+        food.price = row['price']
+        food.is_available = row['is_available']
+        food.updated_at = now
+        if row['image'] and row['image'] != food.image.name:
+            food.image = row['image']
+            new_images[id(food)] = food
+
+    for food, slug in zip(created, allocate_slugs(FoodItem, [food.food_title for food in created], default='food')):
+        food.slug = slug
+    FoodItem.objects.bulk_create(created)
+    FoodItem.objects.bulk_update(
+        list(updated.values()), ['description', 'price', 'is_available', 'image', 'updated_at'], batch_size=500,
+    )
+    # bulk writes skip the post_save receivers, so index and queue resizes here
+    index_fooditems(created + list(updated.values()))
+    queue_image_jobs(list(new_images.values()), 'image')
+    return MenuImportResult(created=len(created), updated=len(updated), categories_created=len(new_categories))
+
+
+def _export_rows(vendor):
+    foods = (
+        FoodItem.objects.filter(vendor=vendor)
+        .order_by('category__category_name', 'food_title', 'id')
+        .values_list('category__category_name', 'food_title', 'description', 'price', 'is_available', 'image')
+    )
+    for category, title, description, price, is_available, image in foods.iterator(chunk_size=500):
+        yield {
+            'category': category,
+            'food_title': title,
+            'description': description or '',
+            'price': str(price),
+            'is_available': is_available,
+            'image': image or '',
+        }
+
+
+class _Echo:
+    # csv.writer target that hands each line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def export_menu_csv(vendor):
+    """``vendor``'s menu as CSV lines, read from the database in chunks."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _export_rows(vendor):
+        row['is_available'] = 'true' if row['is_available'] else 'false'
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def export_menu_json(vendor):
+    """``vendor``'s menu as a JSON list, one item per chunk."""
+    yield '['
+    separator = '\n'
+    for row in _export_rows(vendor):
+        yield separator + json.dumps(row)
+        separator = ',\n'
+    yield '\n]\n'
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment, Order, OrderedFood
+from .models import Payment, Order, OrderedFood, VendorOrder
 
 
 class OrderedFoodInline(admin.TabularInline):
@@ -8,9 +8,15 @@ class OrderedFoodInline(admin.TabularInline):
     extra = 0
 
 
+class VendorOrderInline(admin.TabularInline):
+    model = VendorOrder
+    readonly_fields = ('vendor', 'subtotal', 'tax_data', 'tax', 'grand_total', 'status')
+    extra = 0
+
+
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'name', 'phone', 'email', 'total', 'payment_method', 'status', 'order_placed_to', 'is_ordered']
-    inlines = [OrderedFoodInline]
+    inlines = [OrderedFoodInline, VendorOrderInline]
 
 
 admin.site.register(Payment)
@@ -0,0 +1,124 @@
+from django.db import IntegrityError, transaction
+
+from marketplace.models import Cart
+from .events import publish_new_order
+from .models import IdempotencyKey, Order, OrderedFood, Payment
+from .rollups import record_sales
+
+
+class OrderAlreadyPaid(Exception):
+    def __init__(self, order):
+        super().__init__(f'Order {order.order_number} is already paid')
+        self.order = order
+
+
+def payment_idempotency_key(payment_method, transaction_id):
+    # default key when the client does not send one: a gateway transaction
+    # is captured at most once
+    return f'payment:{payment_method}:{transaction_id}'
+
+
+def _stored_response(user, key):
+    return IdempotencyKey.objects.filter(user=user, key=key).values_list('response', flat=True).first()
+
+
+def _captured_response(user, payment_method, transaction_id):
+    # the response for a gateway transaction already captured under another key
+    order_number = Order.objects.filter(
+        user=user, payment__payment_method=payment_method, payment__transaction_id=transaction_id,
+    ).values_list('order_number', flat=True).first()
+    if order_number is None:
+        return None
+    return {'order_number': order_number, 'transaction_id': transaction_id}
+
+
+def finalize_order(user, order_number, transaction_id, payment_method, status):
+    """
+    Record the payment for ``user``'s order and move their cart into it.
+
+    Payment, order update, ordered items, cart clearing and the vendors'
+    sales rollups happen in one transaction with a fixed number of queries however big the cart is.
+    Returns ``(order, payment, ordered_food)``; raises Order.DoesNotExist
+    for an unknown order number and OrderAlreadyPaid if it was finalized
+    before.
+    """
+    with transaction.atomic():
+        # the row lock keeps two payment callbacks from finalizing twice
+        order = Order.objects.select_for_update().get(user=user, order_number=order_number)
+        if order.is_ordered:
+            raise OrderAlreadyPaid(order)
+        lines = list(Cart.objects.filter(user=user).select_related('fooditem__vendor__user').order_by('created_at', 'id'))
+
+        payment = Payment.objects.create(
+            user=user,
+            transaction_id=transaction_id,
+            payment_method=payment_method,
+            amount=order.total,
+            status=status,
+        )
+
+        order.payment = payment
+        order.is_ordered = True
+        order.save(update_fields=['payment', 'is_ordered', 'updated_at'])
+
+        ordered_food = OrderedFood.objects.bulk_create([
+            OrderedFood(
+                order=order,
+                payment=payment,
+                user=user,
+                fooditem=line.fooditem,
+                quantity=line.quantity,
+                price=line.fooditem.price,
+                amount=line.fooditem.price * line.quantity,
+            )
+            for line in lines
+        ])
+
+        Cart.objects.filter(id__in=[line.id for line in lines]).delete()
+        record_sales(ordered_food)
+        publish_new_order(order, ordered_food)
+    return order, payment, ordered_food
+
+
+def capture_payment(user, order_number, transaction_id, payment_method, status, key=None, on_capture=None):
+    """
+    finalize_order, at most once per idempotency ``key`` (by default the
+    gateway transaction).
+
+    The response sent back to the client is stored under the key in the
+    same transaction as the order writes, and ``on_capture(order, payment,
+    ordered_food)`` runs in it too, so the notifications it queues are
+    committed with the order or not at all. Returns ``(response,
+    finalized)``: ``finalized`` is finalize_order's result, or None when
+    the capture was already recorded and ``response`` is the stored one,
+    so a retried request writes nothing and sends no email.
+    """
+    key = key or payment_idempotency_key(payment_method, transaction_id)
+    stored = _stored_response(user, key)
+    if stored is not None:
+        return stored, None
+
+    response = {
+        'order_number': order_number,
+        'transaction_id': transaction_id,
+    }
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(user=user, key=key, response=response)
+            finalized = finalize_order(user, order_number, transaction_id, payment_method, status)
+            if on_capture is not None:
+                on_capture(*finalized)
+    except IntegrityError:
+        # a concurrent retry stored the key first, or the transaction was
+        # captured under another key
+        stored = _stored_response(user, key) or _captured_response(user, payment_method, transaction_id)
+        if stored is None:
+            raise
+        return stored, None
+    except OrderAlreadyPaid as e:
+        # retried under a different key: answer with the original capture
+        return {
+            'order_number': e.order.order_number,
+            'transaction_id': e.order.payment.transaction_id,
+        }, None
+    return response, finalized
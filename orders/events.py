@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+
+
+ORDER_NEW = 'order.new'
+ORDER_STATUS = 'order.status'
+
+# events kept for a subscriber that is not reading; the oldest are dropped
+MAX_QUEUED_EVENTS = 100
+# idle streams send a comment this often so proxies keep them open
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    def __init__(self, vendor_id, loop, max_queued):
+        self.vendor_id = vendor_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def deliver(self, event):
+        # runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """The next event, or None if none arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderEventBroker:
+    """
+    In-process publish/subscribe of order events per vendor.
+
+    Subscribers are async consumers (the SSE stream); publishers are the
+    sync checkout code, so events are handed to each subscriber's event
+    loop with call_soon_threadsafe. Only subscribers in the publishing
+    process are reached.
+    """
+
+    def __init__(self, max_queued=MAX_QUEUED_EVENTS):
+        self.max_queued = max_queued
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, vendor_id):
+        # must be called from the subscriber's running event loop
+        subscription = Subscription(vendor_id, asyncio.get_running_loop(), self.max_queued)
+        with self._lock:
+            self._subscriptions.setdefault(vendor_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.vendor_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.vendor_id, None)
+
+    def subscriber_count(self, vendor_id):
+        with self._lock:
+            return len(self._subscriptions.get(vendor_id, ()))
+
+    def publish(self, vendor_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(vendor_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # the subscriber's loop has been closed
+                self.unsubscribe(subscription)
+
+
+order_events = OrderEventBroker()
+
+
+def format_event(event):
+    """``event`` as a server-sent events message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(vendor_id, broker=None, heartbeat=HEARTBEAT_SECONDS):
+    """Server-sent events body: ``vendor_id``'s order events until the client goes away."""
+    broker = broker or order_events
+    subscription = broker.subscribe(vendor_id)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            yield format_event(event) if event else ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def publish_on_commit(vendor_ids, event):
+    # subscribers only hear about orders that were actually saved
+    vendor_ids = list(vendor_ids)
+    transaction.on_commit(lambda: [order_events.publish(vendor_id, event) for vendor_id in vendor_ids])
+
+
+def publish_new_order(order, ordered_food):
+    """Tell each vendor of ``order`` about their lines of it once it commits."""
+    items = {}
+    for line in ordered_food:
+        items.setdefault(line.fooditem.vendor_id, []).append(
+            {'food_title': line.fooditem.food_title, 'quantity': line.quantity}
+        )
+    for vendor_id, vendor_items in items.items():
+        publish_on_commit([vendor_id], {
+            'type': ORDER_NEW,
+            'order_number': order.order_number,
+            'status': order.status,
+            'items': vendor_items,
+        })
+
+
+def publish_status_change(order, vendor_ids):
+    publish_on_commit(vendor_ids, {
+        'type': ORDER_STATUS,
+        'order_number': order.order_number,
+        'status': order.status,
+    })
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.rollups import REBUILD_CHUNK_DAYS, rebuild_sales
+from vendor.models import Vendor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or backfill the vendor daily sales rollups from paid order lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD); default: first paid order.')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD); default: today.')
+        parser.add_argument('--vendor', type=int, help='Only rebuild this vendor id.')
+        parser.add_argument('--chunk-days', type=int, default=REBUILD_CHUNK_DAYS)
+
+    def handle(self, *args, **options):
+        vendor = None
+        if options['vendor'] is not None:
+            try:
+                vendor = Vendor.objects.get(pk=options['vendor'])
+            except Vendor.DoesNotExist:
+                raise CommandError(f"Vendor {options['vendor']} does not exist.")
+        written = rebuild_sales(
+            start=options['since'],
+            end=options['until'],
+            vendor=vendor,
+            chunk_days=options['chunk_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} vendor daily sales rows.'))
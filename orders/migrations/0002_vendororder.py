@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:52
+
+import ast
+import json
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def parse_total_data(total_data):
+    # {"vendor_id": {"subtotal": "{'tax_type': {'tax_percentage': 'tax_amount'}}"}},
+    # stored json.dumps()'d inside the JSON column
+    if isinstance(total_data, str):
+        total_data = json.loads(total_data)
+    for vendor_id, data in (total_data or {}).items():
+        subtotal = Decimal('0')
+        tax_data = {}
+        for key, val in data.items():
+            subtotal += Decimal(key)
+            if isinstance(val, str):
+                val = ast.literal_eval(val)
+            tax_data.update(val)
+        yield int(vendor_id), subtotal, tax_data
+
+
+def backfill_vendor_orders(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    VendorOrder = apps.get_model('orders', 'VendorOrder')
+    Vendor = apps.get_model('vendor', 'Vendor')
+    vendor_ids = set(Vendor.objects.values_list('id', flat=True))
+    rows = []
+    for order in Order.objects.exclude(total_data=None).only('id', 'total_data', 'status').iterator():
+        try:
+            totals = list(parse_total_data(order.total_data))
+        except (ValueError, SyntaxError, InvalidOperation, AttributeError):
+            continue
+        for vendor_id, subtotal, tax_data in totals:
+            if vendor_id not in vendor_ids:
+                continue
+            tax = sum(Decimal(str(amount)) for amounts in tax_data.values() for amount in amounts.values())
+            rows.append(VendorOrder(
+                order_id=order.id, vendor_id=vendor_id, subtotal=subtotal, tax_data=tax_data,
+                tax=tax, grand_total=subtotal + tax, status=order.status,
+            ))
+    VendorOrder.objects.bulk_create(rows, batch_size=1000)
+    VendorOrder.objects.update(created_at=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('created_at')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('vendor', '0005_vendor_opening_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('tax_data', models.JSONField(blank=True, default=dict, help_text="Data format: {'tax_type':{'tax_percentage':'tax_amount'}}")),
+                ('tax', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('grand_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('New', 'New'), ('Accepted', 'Accepted'), ('Completed', 'Completed'), ('Cancelled', 'Cancelled')], default='New', max_length=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_orders', to='orders.order')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendor.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'created_at'], name='orders_vend_vendor__85731c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'vendor'), name='unique_vendor_order')],
+            },
+        ),
+        migrations.RunPython(backfill_vendor_orders, migrations.RunPython.noop),
+    ]
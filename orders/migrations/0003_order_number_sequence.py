@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fix_order_numbers(apps, schema_editor):
+    # Orders interrupted between the two saves of the old place_order have no
+    # order number, and orders placed in the same second could share one.
+    # Renumber those with the old timestamp + pk scheme before the column
+    # becomes unique.
+    Order = apps.get_model('orders', 'Order')
+    taken = set()
+    renumber = []
+    for order in Order.objects.only('id', 'order_number', 'created_at').order_by('id').iterator():
+        if not order.order_number or order.order_number in taken:
+            renumber.append(order)
+        else:
+            taken.add(order.order_number)
+    for order in renumber:
+        base = order.created_at.strftime('%Y%m%d%H%M%S') + str(order.id)
+        number, suffix = base, 1
+        while number in taken:
+            number = f'{base}-{suffix}'
+            suffix += 1
+        taken.add(number)
+        Order.objects.filter(pk=order.pk).update(order_number=number)
+
+
+def seed_order_sequence(apps, schema_editor):
+    # continue after the highest pk, the number the old scheme used last
+    Order = apps.get_model('orders', 'Order')
+    OrderSequence = apps.get_model('orders', 'OrderSequence')
+    last_id = Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    OrderSequence.objects.create(name='order', next_value=last_id + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_vendororder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSequence',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(max_length=32),
+        ),
+        migrations.RunPython(fix_order_numbers, migrations.RunPython.noop),
+        migrations.RunPython(seed_order_sequence, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_payments(apps, schema_editor):
+    # Retried captures stored the same gateway transaction more than once,
+    # each with its own copy of the ordered items. Keep the first payment
+    # and drop the copies made by the retries.
+    Payment = apps.get_model('orders', 'Payment')
+    Order = apps.get_model('orders', 'Order')
+    OrderedFood = apps.get_model('orders', 'OrderedFood')
+    duplicates = (
+        Payment.objects.values('payment_method', 'transaction_id')
+        .annotate(count=models.Count('id'), keep=models.Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        extra = list(
+            Payment.objects.filter(payment_method=row['payment_method'], transaction_id=row['transaction_id'])
+            .exclude(id=row['keep']).values_list('id', flat=True)
+        )
+        paid_orders = OrderedFood.objects.filter(payment_id=row['keep']).values('order_id')
+        OrderedFood.objects.filter(payment_id__in=extra, order_id__in=paid_orders).delete()
+        OrderedFood.objects.filter(payment_id__in=extra).update(payment_id=row['keep'])
+        Order.objects.filter(payment_id__in=extra).update(payment_id=row['keep'])
+        Payment.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_number_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('response', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(merge_duplicate_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('payment_method', 'transaction_id'), name='unique_payment_transaction'),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
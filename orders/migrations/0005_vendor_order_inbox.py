@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_payment_idempotency'),
+        ('vendor', '0005_vendor_opening_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_orde_status_25e057_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendororder',
+            index=models.Index(fields=['vendor', 'status', 'created_at'], name='orders_vend_vendor__31e3f9_idx'),
+        ),
+    ]
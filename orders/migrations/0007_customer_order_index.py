@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_vendor_sales_rollups'),
+        ('vendor', '0005_vendor_opening_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'is_ordered', 'created_at'], name='orders_orde_user_id_081520_idx'),
+        ),
+    ]
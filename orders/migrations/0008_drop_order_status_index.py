@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_customer_order_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_status_25e057_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_drop_order_status_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderedfood',
+            index=models.Index(fields=['created_at'], name='orders_orde_created_d31d56_idx'),
+        ),
+    ]
@@ -1,12 +1,11 @@
 import json
+
 from django.db import models
 from accounts.models import User
 from menu.models import FoodItem
 from vendor.models import Vendor
 
 
-request_object = ''
-
 class Payment(models.Model):
     PAYMENT_METHOD = (
         ('PayPal', 'PayPal'),
@@ -19,10 +18,42 @@ class Payment(models.Model):
     status = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # a gateway transaction can only be captured once
+            models.UniqueConstraint(fields=['payment_method', 'transaction_id'], name='unique_payment_transaction'),
+        ]
+
     def __str__(self):
         return self.transaction_id
 
 
+class IdempotencyKey(models.Model):
+    # Response of a request that changed data, replayed when the same
+    # client retries it with the same key (see orders.views.payments)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class OrderSequence(models.Model):
+    # Named counters handed out in blocks by orders.utils.OrderNumberAllocator
+    name = models.CharField(max_length=30, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return self.name
+
+
 class Order(models.Model):
     STATUS = (
         ('New', 'New'),
@@ -34,7 +65,7 @@ class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True)
     vendors = models.ManyToManyField(Vendor, blank=True)
-    order_number = models.CharField(max_length=20)
+    order_number = models.CharField(max_length=32, unique=True)
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     phone = models.CharField(max_length=15, blank=True)
@@ -46,6 +77,7 @@ class Order(models.Model):
     pin_code = models.CharField(max_length=10)
     total = models.FloatField()
     tax_data = models.JSONField(blank=True, help_text = "Data format: {'tax_type':{'tax_percentage':'tax_amount'}}", null=True)
+    # legacy per-vendor totals, no longer written; see VendorOrder
     total_data = models.JSONField(blank=True, null=True)
     total_tax = models.FloatField()
     payment_method = models.CharField(max_length=25)
@@ -54,48 +86,68 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_ordered', 'created_at']),
+        ]
+
     # Concatenate first name and last name
     @property
     def name(self):
         return f'{self.first_name} {self.last_name}'
 
+    @property
+    def tax_dict(self):
+        # checkout stores tax_data as a JSON-encoded string
+        if isinstance(self.tax_data, str):
+            return json.loads(self.tax_data)
+        return self.tax_data or {}
+
     def order_placed_to(self):
         return ", ".join([str(i) for i in self.vendors.all()])
 
-    def get_total_by_vendor(self):
-        vendor = Vendor.objects.get(user=request_object.user)
-        subtotal = 0
-        tax = 0
-        tax_dict = {}
-        if self.total_data:
-            total_data = json.loads(self.total_data)
-            data = total_data.get(str(vendor.id))
-            
-            
-            for key, val in data.items():
-                subtotal += float(key)
-                val = val.replace("'", '"')
-                val = json.loads(val)
-                tax_dict.update(val)
-
-                # calculate tax
-                # {'CGST': {'9.00': '6.03'}, 'SGST': {'7.00': '4.69'}}
-                for i in val:
-                    for j in val[i]:
-                        tax += float(val[i][j])
-        grand_total = float(subtotal) + float(tax)
-        context = {
-            'subtotal': subtotal,
-            'tax_dict': tax_dict, 
-            'grand_total': grand_total,
-        }
-
-        return context
+    def get_total_by_vendor(self, vendor):
+        vendor_order = self.vendor_orders.filter(vendor=vendor).first()
+        if vendor_order is None:
+            return {'subtotal': 0, 'tax_dict': {}, 'grand_total': 0}
+        return vendor_order.totals()
 
     def __str__(self):
         return self.order_number
 
 
+class VendorOrder(models.Model):
+    # One vendor's share of an order, written at checkout from orders.pricing;
+    # status follows Order.status (see orders.signals)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='vendor_orders')
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    tax_data = models.JSONField(blank=True, default=dict, help_text = "Data format: {'tax_type':{'tax_percentage':'tax_amount'}}")
+    tax = models.DecimalField(max_digits=12, decimal_places=2)
+    grand_total = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=15, choices=Order.STATUS, default='New')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'vendor'], name='unique_vendor_order'),
+        ]
+        indexes = [
+            models.Index(fields=['vendor', 'created_at']),
+            models.Index(fields=['vendor', 'status', 'created_at']),
+        ]
+
+    def totals(self):
+        return {
+            'subtotal': self.subtotal,
+            'tax_dict': self.tax_data,
+            'grand_total': self.grand_total,
+        }
+
+    def __str__(self):
+        return f'{self.order} - {self.vendor}'
+
+
 class OrderedFood(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True)
@@ -107,5 +159,45 @@ class OrderedFood(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # the day ranges of orders.rollups.rebuild_sales_rollups
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return self.fooditem.food_title
+
+class VendorDailySales(models.Model):
+    # Paid sales of one vendor on one day, kept up to date at checkout by
+    # orders.rollups and rebuilt by the rebuild_sales_rollups command
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    day = models.DateField()
+    order_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'day'], name='unique_vendor_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor} - {self.day}'
+
+
+class VendorItemDailySales(models.Model):
+    # Per food item counterpart of VendorDailySales, for top items
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    fooditem = models.ForeignKey(FoodItem, on_delete=models.CASCADE)
+    day = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'day', 'fooditem'], name='unique_vendor_item_daily_sales'),
+        ]
+
     def __str__(self):
-        return self.fooditem.food_title
\ No newline at end of file
+        return f'{self.fooditem} - {self.day}'
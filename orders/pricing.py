@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from marketplace.models import Cart
+from marketplace.taxes import compute_tax, get_tax_rules
+from .models import VendorOrder
+
+
+def _stored_tax_dict(tax_dict):
+    # amounts are stored as strings
+    return {
+        tax_type: {percentage: str(amount) for percentage, amount in amounts.items()}
+        for tax_type, amounts in tax_dict.items()
+    }
+
+
+class VendorTotals:
+    def __init__(self, vendor, subtotal, tax_dict):
+        self.vendor = vendor
+        self.subtotal = subtotal
+        self.tax_dict = tax_dict
+        self.tax = sum(x for key in tax_dict.values() for x in key.values())
+        self.grand_total = subtotal + self.tax
+
+
+class CheckoutPricing:
+    """
+    Prices of a user's cart for checkout: the cart lines (with food item and
+    vendor loaded), the order totals, and per-vendor subtotal and tax.
+    """
+
+    def __init__(self, lines, subtotal, tax_dict, vendors):
+        self.lines = lines
+        self.subtotal = subtotal
+        self.tax_dict = tax_dict
+        self.tax = sum(x for key in tax_dict.values() for x in key.values())
+        self.grand_total = subtotal + self.tax
+        self.vendors = vendors
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @property
+    def vendor_ids(self):
+        return list(self.vendors)
+
+    def vendor_orders(self, order):
+        # unsaved VendorOrder rows for ``order``, one per vendor
+        return [
+            VendorOrder(
+                order=order,
+                vendor_id=vendor_id,
+                subtotal=totals.subtotal,
+                tax_data=_stored_tax_dict(totals.tax_dict),
+                tax=totals.tax,
+                grand_total=totals.grand_total,
+                status=order.status,
+            )
+            for vendor_id, totals in self.vendors.items()
+        ]
+
+
+def price_cart(user):
+    """Price ``user``'s cart from one joined query over the cart lines."""
+    lines = list(Cart.objects.filter(user=user).select_related('fooditem__vendor').order_by('created_at', 'id'))
+    rules = get_tax_rules()
+
+    subtotal = Decimal('0')
+    vendor_subtotals = {}
+    vendors = {}
+    for line in lines:
+        amount = line.fooditem.price * line.quantity
+        subtotal += amount
+        vendor_id = line.fooditem.vendor_id
+        vendor_subtotals[vendor_id] = vendor_subtotals.get(vendor_id, Decimal('0')) + amount
+        vendors[vendor_id] = line.fooditem.vendor
+
+    return CheckoutPricing(
+        lines=lines,
+        subtotal=subtotal,
+        tax_dict=compute_tax(subtotal, rules),
+        vendors={
+            vendor_id: VendorTotals(vendors[vendor_id], vendor_subtotal, compute_tax(vendor_subtotal, rules))
+            for vendor_id, vendor_subtotal in vendor_subtotals.items()
+        },
+    )
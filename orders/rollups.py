@@ -0,0 +1,193 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from marketplace.cart import CENTS
+from .models import OrderedFood, VendorDailySales, VendorItemDailySales
+
+
+DASHBOARD_DAYS = 90
+TOP_ITEMS = 5
+REBUILD_CHUNK_DAYS = 30
+
+
+def _amount(value):
+    # OrderedFood keeps prices as floats
+    return Decimal(str(value or 0)).quantize(CENTS)
+
+
+def _add_to_counters(model, key_fields, rows):
+    """
+    Add ``rows`` (dicts of column values) to ``model``'s counters in one
+    INSERT ... ON CONFLICT DO UPDATE: new keys are inserted, existing ones
+    have every non-key column incremented.
+    """
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    keys = [connection.ops.quote_name(model._meta.get_field(name).column) for name in key_fields]
+    counters = [column for column in columns if column not in keys]
+
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES {placeholders} '
+        f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET '
+        + ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in counters)
+    )
+    params = [field.get_db_prep_save(row[field.name], connection) for row in rows for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_sales(ordered_food):
+    """
+    Add the lines of one freshly paid order to the daily rollups; two
+    statements however many vendors and items the order has.
+    """
+    if not ordered_food:
+        return
+    day = timezone.localdate(ordered_food[0].created_at)
+    vendors = {}
+    items = {}
+    for line in ordered_food:
+        vendor_id = line.fooditem.vendor_id
+        amount = _amount(line.amount)
+        totals = vendors.setdefault(vendor_id, {'order_count': 1, 'item_count': 0, 'revenue': Decimal('0')})
+        totals['item_count'] += line.quantity
+        totals['revenue'] += amount
+        item = items.setdefault((vendor_id, line.fooditem_id), {'quantity': 0, 'revenue': Decimal('0')})
+        item['quantity'] += line.quantity
+        item['revenue'] += amount
+
+    _add_to_counters(VendorDailySales, ['vendor', 'day'], [
+        dict(vendor=vendor_id, day=day, **totals) for vendor_id, totals in vendors.items()
+    ])
+    _add_to_counters(VendorItemDailySales, ['vendor', 'day', 'fooditem'], [
+        dict(vendor=vendor_id, fooditem=fooditem_id, day=day, **totals)
+        for (vendor_id, fooditem_id), totals in items.items()
+    ])
+
+
+def rebuild_sales(start=None, end=None, vendor=None, chunk_days=REBUILD_CHUNK_DAYS):
+    """
+    Recompute the rollups for days ``start``..``end`` (default: from the
+    first paid order to today) from OrderedFood, ``chunk_days`` days per
+    transaction. Returns the number of vendor-day rows written.
+
+    Checkouts landing in the chunk being rebuilt may be counted twice or
+    not at all, so run it while the chunk is quiet (e.g. for past days).
+    """
+    lines = OrderedFood.objects.filter(order__is_ordered=True)
+    if vendor is not None:
+        lines = lines.filter(fooditem__vendor=vendor)
+    if start is None:
+        first = lines.aggregate(first=Min('created_at'))['first']
+        if first is None:
+            return 0
+        start = timezone.localdate(first)
+    end = end or timezone.localdate()
+
+    written = 0
+    while start <= end:
+        stop = min(start + timedelta(days=chunk_days - 1), end)
+        written += _rebuild_chunk(lines, start, stop, vendor)
+        start = stop + timedelta(days=1)
+    return written
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _rebuild_chunk(lines, start, end, vendor):
+    # a half-open range on the column itself, so the created_at index bounds
+    # the scan; days are local, as TruncDate groups them
+    lines = lines.filter(
+        created_at__gte=_day_start(start), created_at__lt=_day_start(end + timedelta(days=1)),
+    ).annotate(day=TruncDate('created_at'))
+    daily = (
+        lines.values('fooditem__vendor_id', 'day')
+        .annotate(order_count=Count('order_id', distinct=True), item_count=Sum('quantity'), revenue=Sum('amount'))
+        .order_by()
+    )
+    by_item = (
+        lines.values('fooditem__vendor_id', 'fooditem_id', 'day')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('amount'))
+        .order_by()
+    )
+    with transaction.atomic():
+        for model in (VendorDailySales, VendorItemDailySales):
+            stale = model.objects.filter(day__gte=start, day__lte=end)
+            if vendor is not None:
+                stale = stale.filter(vendor=vendor)
+            stale.delete()
+        rows = VendorDailySales.objects.bulk_create([
+            VendorDailySales(
+                vendor_id=row['fooditem__vendor_id'], day=row['day'], order_count=row['order_count'],
+                item_count=row['item_count'], revenue=_amount(row['revenue']),
+            )
+            for row in daily
+        ])
+        VendorItemDailySales.objects.bulk_create([
+            VendorItemDailySales(
+                vendor_id=row['fooditem__vendor_id'], fooditem_id=row['fooditem_id'], day=row['day'],
+                quantity=row['quantity'], revenue=_amount(row['revenue']),
+            )
+            for row in by_item
+        ], batch_size=1000)
+    return len(rows)
+
+
+class SalesSummary:
+    """A vendor's sales over the last ``len(days)`` days, read from the rollups."""
+
+    def __init__(self, days, top_items):
+        self.days = days
+        self.top_items = top_items
+        self.order_count = sum(day['order_count'] for day in days)
+        self.revenue = sum((day['revenue'] for day in days), Decimal('0'))
+        this_month = days[-1]['day'].replace(day=1)
+        self.month_revenue = sum((day['revenue'] for day in days if day['day'] >= this_month), Decimal('0'))
+
+        peak = max((day['revenue'] for day in days), default=0) or 1
+        for day in days:
+            # bar height for the dashboard chart, in percent of the best day
+            day['height'] = int(day['revenue'] * 100 / peak)
+
+    @property
+    def weeks(self):
+        # Monday-based weeks, oldest first
+        weeks = {}
+        for day in self.days:
+            start = day['day'] - timedelta(days=day['day'].weekday())
+            week = weeks.setdefault(start, {'week': start, 'order_count': 0, 'revenue': Decimal('0')})
+            week['order_count'] += day['order_count']
+            week['revenue'] += day['revenue']
+        return list(weeks.values())
+
+
+def vendor_sales_summary(vendor, days=DASHBOARD_DAYS, today=None):
+    """Two queries over at most ``days`` rollup rows (plus their items)."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row['day']: row
+        for row in VendorDailySales.objects.filter(vendor=vendor, day__gte=start, day__lte=today)
+        .values('day', 'order_count', 'item_count', 'revenue')
+    }
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        series.append(rows.get(day) or {'day': day, 'order_count': 0, 'item_count': 0, 'revenue': Decimal('0')})
+
+    top_items = list(
+        VendorItemDailySales.objects.filter(vendor=vendor, day__gte=start, day__lte=today)
+        .values('fooditem_id', 'fooditem__food_title')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', '-quantity')[:TOP_ITEMS]
+    )
+    return SalesSummary(series, top_items)
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from accounts.utils import fields_changed
+from .events import publish_status_change
+from .models import Order, VendorOrder
+
+
+@receiver(pre_save, sender=Order)
+def remember_status_change_receiver(sender, instance, update_fields=None, **kwargs):
+    instance._status_changed = not instance._state.adding and fields_changed(instance, ('status',), update_fields)
+
+
+@receiver(post_save, sender=Order)
+def order_status_receiver(sender, instance, created, **kwargs):
+    # the vendor inbox filters on VendorOrder.status, so keep it in step
+    if instance.__dict__.pop('_status_changed', False):
+        vendor_orders = VendorOrder.objects.filter(order=instance)
+        vendor_ids = list(vendor_orders.values_list('vendor_id', flat=True))
+        vendor_orders.update(status=instance.status)
+        if instance.is_ordered:
+            publish_status_change(instance, vendor_ids)
@@ -1,3 +1,511 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import TemplateDoesNotExist
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from marketplace.models import Cart, Tax
+from marketplace.taxes import get_tax_rules
+from menu.models import Category, FoodItem
+from vendor.models import Vendor
+from .checkout import finalize_order
+from .events import OrderEventBroker, event_stream, order_events
+from .models import IdempotencyKey, Order, OrderedFood, Payment, VendorDailySales, VendorItemDailySales, VendorOrder
+from .pricing import price_cart
+from .rollups import rebuild_sales, vendor_sales_summary
+from .utils import OrderNumberAllocator, order_numbers, order_total_by_vendor, vendor_notification_contexts, vendor_order_inbox
+
+
+def create_user(name, role=User.CUSTOMER):
+    user = User.objects.create_user(first_name=name, last_name='User', username=name, email=f'{name}@example.com', password='secret')
+    user.role = role
+    user.is_active = True
+    user.save()
+    return user
+
+
+def create_vendor(name):
+    user = create_user(name, role=User.VENDOR)
+    return Vendor.objects.create(
+        user=user,
+        user_profile=UserProfile.objects.get(user=user),
+        vendor_name=name,
+        vendor_slug=name,
+        vendor_license='vendor/license/license.jpg',
+        is_approved=True,
+    )
+
+
+def create_food(vendor, title, price):
+    category, _ = Category.objects.get_or_create(vendor=vendor, category_name='General')
+    return FoodItem.objects.create(vendor=vendor, category=category, food_title=title, price=price, image='foodimages/food.jpg')
+
+
+class PricingTest(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+        self.customer = create_user('customer')
+        self.first = create_vendor('first')
+        self.second = create_vendor('second')
+        Cart.objects.create(user=self.customer, fooditem=create_food(self.first, 'Pizza', '12.50'), quantity=2)
+        Cart.objects.create(user=self.customer, fooditem=create_food(self.first, 'Cola', '2.00'), quantity=1)
+        Cart.objects.create(user=self.customer, fooditem=create_food(self.second, 'Rice', '3.33'), quantity=3)
+
+    def test_totals(self):
+        pricing = price_cart(self.customer)
+        self.assertEqual(pricing.subtotal, Decimal('36.99'))
+        self.assertEqual(pricing.tax_dict, {'VAT': {'10.00': Decimal('3.70')}})
+        self.assertEqual(pricing.grand_total, Decimal('40.69'))
+        self.assertEqual(pricing.vendor_ids, [self.first.id, self.second.id])
+        self.assertEqual(pricing.vendors[self.first.id].subtotal, Decimal('27.00'))
+        self.assertEqual(pricing.vendors[self.second.id].grand_total, Decimal('10.99'))
+
+    def test_place_order(self):
+        self.client.force_login(self.customer)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('place_order'), {
+                'first_name': 'A', 'last_name': 'B', 'email': 'a@example.com', 'address': 'Road 1',
+                'city': 'Dhaka', 'pin_code': '1200', 'payment_method': 'PayPal',
+            })
+        self.assertEqual(response.status_code, 200)
+        order_writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('INSERT INTO "orders_order"', 'UPDATE "orders_order"'))]
+        self.assertEqual(len(order_writes), 1)
+        order = Order.objects.get()
+        self.assertAlmostEqual(order.total, 40.69)
+        # per-vendor totals live in VendorOrder only
+        self.assertIsNone(order.total_data)
+        self.assertEqual(set(order.vendors.values_list('id', flat=True)), {self.first.id, self.second.id})
+        totals = order_total_by_vendor(order, self.second.id)
+        self.assertEqual(totals['subtotal'], Decimal('9.99'))
+        self.assertEqual(totals['tax_dict'], {'VAT': {'10.00': '1.00'}})
+        self.assertEqual(totals['grand_total'], Decimal('10.99'))
+        self.assertEqual(order.vendor_orders.get(vendor=self.first).tax, Decimal('2.70'))
+
+    def test_parse_legacy_total_data(self):
+        migration = import_module('orders.migrations.0002_vendororder')
+        total_data = json.dumps({'7': {'27.00': str({'VAT': {'10.00': '2.70'}})}})
+        self.assertEqual(
+            list(migration.parse_total_data(total_data)),
+            [(7, Decimal('27.00'), {'VAT': {'10.00': '2.70'}})],
+        )
+
+
+class OrderNumberTest(TransactionTestCase):
+
+    def setUp(self):
+        order_numbers.reset()
+
+    def test_workers_get_disjoint_blocks(self):
+        first = OrderNumberAllocator('order', block_size=5)
+        second = OrderNumberAllocator('order', block_size=5)
+        values = [first.allocate() for _ in range(7)] + [second.allocate() for _ in range(7)]
+        self.assertEqual(len(set(values)), 14)
+        with self.assertNumQueries(0):
+            first.allocate()
+
+    def test_new_sequence_starts_at_one(self):
+        allocator = OrderNumberAllocator('other', block_size=3)
+        self.assertEqual([allocator.allocate() for _ in range(4)], [1, 2, 3, 4])
+
+    def test_rolled_back_transaction_keeps_no_block(self):
+        allocator = OrderNumberAllocator('order', block_size=5)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                number = allocator.allocate()
+                raise RuntimeError
+        # the reservation was rolled back, so the number is free again;
+        # this process must not hand it out a second time
+        self.assertEqual(OrderNumberAllocator('order', block_size=5).allocate(), number)
+        self.assertNotEqual(allocator.allocate(), number)
+
+
+class FinalizeOrderTest(TestCase):
+
+    def setUp(self):
+        self.customer = create_user('payer')
+        self.vendor = create_vendor('payvendor')
+
+    def place(self, lines):
+        Cart.objects.filter(user=self.customer).delete()
+        for i in range(lines):
+            Cart.objects.create(user=self.customer, fooditem=create_food(self.vendor, f'Dish {lines}-{i}', '5.00'), quantity=2)
+        return Order.objects.create(
+            user=self.customer, order_number=f'ORD{lines}', first_name='A', last_name='B', email='a@example.com',
+            address='Road 1', city='Dhaka', pin_code='1200', total=10.0 * lines, total_tax=0, payment_method='PayPal',
+        )
+
+    def finalize(self, order):
+        with CaptureQueriesContext(connection) as ctx:
+            result = finalize_order(self.customer, order.order_number, f'TX{order.id}', 'PayPal', 'COMPLETED')
+        return len(ctx.captured_queries), result
+
+    def test_finalize_moves_cart_into_order(self):
+        order = self.place(3)
+        _, (order, payment, ordered_food) = self.finalize(order)
+        self.assertTrue(order.is_ordered)
+        self.assertEqual(order.payment, payment)
+        self.assertEqual(float(payment.amount), 30.0)
+        self.assertEqual(len(ordered_food), 3)
+        self.assertEqual(OrderedFood.objects.filter(order=order, payment=payment, amount=10.0).count(), 3)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_vendor_fan_out_is_grouped(self):
+        vendors = [self.vendor] + [create_vendor(f'fanout{i}') for i in range(9)]
+        order = self.place(0)
+        for i, vendor in enumerate(vendors):
+            Cart.objects.create(user=self.customer, fooditem=create_food(vendor, f'Meal {i}', '4.00'), quantity=1)
+            Cart.objects.create(user=self.customer, fooditem=create_food(vendor, f'Drink {i}', '1.00'), quantity=1)
+            VendorOrder.objects.create(order=order, vendor=vendor, subtotal='5.00', tax='0.50', grand_total='5.50', tax_data={'VAT': {'10.00': '0.50'}})
+        _, (order, _, ordered_food) = self.finalize(order)
+        with self.assertNumQueries(1):
+            contexts = vendor_notification_contexts(order, ordered_food)
+        self.assertEqual(len(contexts), 10)
+        self.assertEqual({c['to_email'] for c in contexts}, {v.user.email for v in vendors})
+        self.assertTrue(all(len(c['ordered_food_to_vendor']) == 2 for c in contexts))
+        self.assertTrue(all(c['vendor_grand_total'] == Decimal('5.50') for c in contexts))
+
+    def test_query_count_does_not_grow_with_cart(self):
+        small, _ = self.finalize(self.place(1))
+        large, _ = self.finalize(self.place(25))
+        self.assertEqual(small, large)
+
+
+class PaymentIdempotencyTest(TestCase):
+
+    def setUp(self):
+        self.customer = create_user('retrier')
+        vendor = create_vendor('retryvendor')
+        Cart.objects.create(user=self.customer, fooditem=create_food(vendor, 'Soup', '6.00'), quantity=2)
+        self.order = Order.objects.create(
+            user=self.customer, order_number='ORDRETRY', first_name='A', last_name='B', email='a@example.com',
+            address='Road 1', city='Dhaka', pin_code='1200', total=12.0, total_tax=0, payment_method='PayPal',
+            tax_data='{}',
+        )
+        self.client.force_login(self.customer)
+        # count notifications rather than render them
+        for name in ('send_notification', 'send_notifications'):
+            patcher = mock.patch(f'orders.views.{name}')
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def capture(self, transaction_id='TX1', **headers):
+        response = self.client.post(reverse('payments'), {
+            'order_number': 'ORDRETRY', 'transaction_id': transaction_id, 'payment_method': 'PayPal', 'status': 'COMPLETED',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest', **headers)
+        return response.json()
+
+    def counts(self):
+        return (Payment.objects.count(), OrderedFood.objects.count(),
+                self.send_notification.call_count, self.send_notifications.call_count)
+
+    def test_replay_returns_stored_response_without_writes(self):
+        first = self.capture()
+        self.assertEqual(first, {'order_number': 'ORDRETRY', 'transaction_id': 'TX1'})
+        counts = self.counts()
+        self.assertEqual(counts, (1, 1, 1, 1))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.capture(), first)
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.counts(), counts)
+
+    def test_client_key(self):
+        first = self.capture(HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(self.capture(HTTP_IDEMPOTENCY_KEY='abc'), first)
+        self.assertTrue(IdempotencyKey.objects.filter(user=self.customer, key='abc').exists())
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_paid_order_answers_with_original_capture(self):
+        first = self.capture('TX1')
+        counts = self.counts()
+        self.assertEqual(self.capture('TX2'), first)
+        self.assertEqual(self.counts(), counts)
+        self.assertFalse(Payment.objects.filter(transaction_id='TX2').exists())
+
+    def test_failed_notification_rolls_back_the_capture(self):
+        self.send_notification.side_effect = TemplateDoesNotExist('orders/order_confirmation_email.html')
+        with self.assertRaises(TemplateDoesNotExist):
+            self.capture()
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+        self.assertFalse(IdempotencyKey.objects.exists())
+        # the retry captures and queues the emails
+        self.send_notification.side_effect = None
+        self.assertEqual(self.capture(), {'order_number': 'ORDRETRY', 'transaction_id': 'TX1'})
+        self.assertEqual(self.counts(), (1, 1, 2, 1))
+
+    def test_transaction_captured_under_another_key(self):
+        first = self.capture(HTTP_IDEMPOTENCY_KEY='first')
+        Order.objects.create(
+            user=self.customer, order_number='ORDOTHER', first_name='A', last_name='B', email='a@example.com',
+            address='Road 1', city='Dhaka', pin_code='1200', total=12.0, total_tax=0, payment_method='PayPal',
+            tax_data='{}',
+        )
+        response = self.client.post(reverse('payments'), {
+            'order_number': 'ORDOTHER', 'transaction_id': 'TX1', 'payment_method': 'PayPal', 'status': 'COMPLETED',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest', HTTP_IDEMPOTENCY_KEY='second')
+        self.assertEqual(response.json(), first)
+        self.assertFalse(Order.objects.get(order_number='ORDOTHER').is_ordered)
+
+
+class VendorOrderInboxTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_vendor('inbox')
+        self.other = create_vendor('otherinbox')
+        customer = create_user('inboxcustomer')
+        self.orders = []
+        for i in range(7):
+            order = Order.objects.create(
+                user=customer, order_number=f'INBOX{i}', first_name='A', last_name='B', email='a@example.com',
+                address='Road 1', city='Dhaka', pin_code='1200', total=11.0, total_tax=1.0, payment_method='PayPal',
+                is_ordered=i != 6,
+            )
+            for vendor in (self.vendor, self.other):
+                VendorOrder.objects.create(order=order, vendor=vendor, subtotal='10.00', tax='1.00', grand_total='11.00')
+            self.orders.append(order)
+
+    def test_pages_newest_paid_orders_first(self):
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                page = vendor_order_inbox(self.vendor, cursor=cursor, page_size=4)
+            seen += [vendor_order.order.order_number for vendor_order in page.items]
+            self.assertTrue(all(vendor_order.vendor_id == self.vendor.id for vendor_order in page.items))
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [f'INBOX{i}' for i in reversed(range(6))])
+
+    def test_status_filter_follows_order_status(self):
+        order = self.orders[2]
+        order.status = 'Completed'
+        order.save()
+        page = vendor_order_inbox(self.vendor, status='Completed')
+        self.assertEqual([vendor_order.order_id for vendor_order in page.items], [order.id])
+        self.assertEqual(order.get_total_by_vendor(self.other)['grand_total'], Decimal('11.00'))
+
+    def test_saves_leaving_status_out_skip_the_check(self):
+        order = Order.objects.get(pk=self.orders[2].pk)
+        order.status = 'Completed'
+        # neither loading the order nor saving other fields reads it back
+        with self.assertNumQueries(1):
+            order.save(update_fields=['updated_at'])
+        self.assertEqual(VendorOrder.objects.filter(order=order, status='Completed').count(), 0)
+
+    def test_view(self):
+        self.client.force_login(self.vendor.user)
+        response = self.client.get(reverse('vendor_orders'), {'status': 'New'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['vendor_orders']), 6)
+        self.assertContains(response, 'INBOX5')
+
+
+class SalesRollupTest(TestCase):
+
+    def setUp(self):
+        self.customer = create_user('rollupcustomer')
+        self.vendor = create_vendor('rollupvendor')
+        self.other = create_vendor('rollupother')
+        self.soup = create_food(self.vendor, 'Soup', '6.00')
+        self.bread = create_food(self.vendor, 'Bread', '1.50')
+        self.tea = create_food(self.other, 'Tea', '2.25')
+        for i, lines in enumerate([[(self.soup, 2), (self.bread, 1), (self.tea, 4)], [(self.soup, 1)]]):
+            for food, quantity in lines:
+                Cart.objects.create(user=self.customer, fooditem=food, quantity=quantity)
+            order = Order.objects.create(
+                user=self.customer, order_number=f'ROLL{i}', first_name='A', last_name='B', email='a@example.com',
+                address='Road 1', city='Dhaka', pin_code='1200', total=0, total_tax=0, payment_method='PayPal',
+            )
+            finalize_order(self.customer, order.order_number, f'ROLLTX{i}', 'PayPal', 'COMPLETED')
+
+    def rollups(self):
+        return (
+            sorted(VendorDailySales.objects.values_list('vendor_id', 'order_count', 'item_count', 'revenue')),
+            sorted(VendorItemDailySales.objects.values_list('fooditem_id', 'quantity', 'revenue')),
+        )
+
+    def test_checkout_updates_rollups(self):
+        daily, items = self.rollups()
+        self.assertEqual(daily, sorted([(self.vendor.id, 2, 4, Decimal('19.50')), (self.other.id, 1, 4, Decimal('9.00'))]))
+        self.assertEqual(items, sorted([
+            (self.soup.id, 3, Decimal('18.00')), (self.bread.id, 1, Decimal('1.50')), (self.tea.id, 4, Decimal('9.00')),
+        ]))
+
+    def test_rebuild_matches_incremental(self):
+        incremental = self.rollups()
+        VendorDailySales.objects.update(order_count=0, revenue=0)
+        VendorItemDailySales.objects.all().delete()
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_chunks_are_local_days(self):
+        today = timezone.localdate()
+        last_night = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min)) - datetime.timedelta(microseconds=1)
+        OrderedFood.objects.filter(order__order_number='ROLL1').update(created_at=last_night)
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_sales(start=today, end=today)
+        # the chunk is bounded on the column itself, not on a cast of it
+        line_reads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'orders_orderedfood' in q['sql']]
+        self.assertTrue(line_reads)
+        self.assertTrue(all('"orders_orderedfood"."created_at" >= ' in sql for sql in line_reads))
+        self.assertEqual(VendorDailySales.objects.get(vendor=self.vendor).order_count, 1)
+
+    def test_dashboard_summary(self):
+        with self.assertNumQueries(2):
+            sales = vendor_sales_summary(self.vendor)
+        self.assertEqual(len(sales.days), 90)
+        self.assertEqual(sales.order_count, 2)
+        self.assertEqual(sales.revenue, Decimal('19.50'))
+        self.assertEqual(sales.top_items[0]['fooditem__food_title'], 'Soup')
+        self.assertEqual(sum(week['order_count'] for week in sales.weeks), 2)
+
+        self.client.force_login(self.vendor.user)
+        response = self.client.get(reverse('vendorDashboard'))
+        self.assertContains(response, '19.50')
+
+
+class OrderEventBrokerTest(SimpleTestCase):
+
+    async def test_publish_from_another_thread(self):
+        broker = OrderEventBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+        thread = threading.Thread(target=broker.publish, args=(1, {'type': 'order.new', 'order_number': '1'}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await subscription.get(timeout=1), {'type': 'order.new', 'order_number': '1'})
+        self.assertIsNone(await other.get(timeout=0.01))
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other)
+        self.assertEqual(broker.subscriber_count(1), 0)
+
+    async def test_slow_subscriber_keeps_newest_events(self):
+        broker = OrderEventBroker(max_queued=2)
+        subscription = broker.subscribe(1)
+        for i in range(4):
+            broker.publish(1, {'type': 'order.new', 'order_number': str(i)})
+        await asyncio.sleep(0)
+        self.assertEqual([(await subscription.get(timeout=1))['order_number'] for _ in range(2)], ['2', '3'])
+
+    async def test_stream(self):
+        broker = OrderEventBroker()
+        stream = event_stream(1, broker=broker, heartbeat=0.01)
+        self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        broker.publish(1, {'type': 'order.status', 'order_number': '9', 'status': 'Completed'})
+        self.assertEqual(
+            await anext(stream),
+            'event: order.status\ndata: {"type": "order.status", "order_number": "9", "status": "Completed"}\n\n',
+        )
+        await stream.aclose()
+        self.assertEqual(broker.subscriber_count(1), 0)
+
+
+class OrderEventPublishTest(TestCase):
+
+    def setUp(self):
+        self.customer = create_user('eventcustomer')
+        self.vendor = create_vendor('eventvendor')
+        Cart.objects.create(user=self.customer, fooditem=create_food(self.vendor, 'Stew', '7.00'), quantity=3)
+        self.order = Order.objects.create(
+            user=self.customer, order_number='EVENT1', first_name='A', last_name='B', email='a@example.com',
+            address='Road 1', city='Dhaka', pin_code='1200', total=21.0, total_tax=0, payment_method='PayPal',
+        )
+        VendorOrder.objects.create(order=self.order, vendor=self.vendor, subtotal='21.00', tax='0.00', grand_total='21.00')
+
+    def test_finalize_and_status_change_publish_after_commit(self):
+        with mock.patch.object(order_events, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                order, _, _ = finalize_order(self.customer, 'EVENT1', 'EVENTTX', 'PayPal', 'COMPLETED')
+                publish.assert_not_called()
+            publish.assert_called_once_with(self.vendor.id, {
+                'type': 'order.new', 'order_number': 'EVENT1', 'status': 'New',
+                'items': [{'food_title': 'Stew', 'quantity': 3}],
+            })
+            with self.captureOnCommitCallbacks(execute=True):
+                order.status = 'Accepted'
+                order.save()
+            publish.assert_called_with(self.vendor.id, {'type': 'order.status', 'order_number': 'EVENT1', 'status': 'Accepted'})
+
+    async def test_view_streams_vendor_events(self):
+        await self.async_client.aforce_login(self.vendor.user)
+        response = await self.async_client.get(reverse('vendor_order_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 5000\n\n')
+        order_events.publish(self.vendor.id, {'type': 'order.new', 'order_number': 'EVENT1'})
+        self.assertIn(b'event: order.new', await anext(content))
+        # the ASGI handler cancels the response when the client disconnects
+        pending = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(order_events.subscriber_count(self.vendor.id), 0)
+
+
+@tag('benchmark')
+class PricingBenchmark(TestCase):
+
+    def test_queries_do_not_grow_with_cart(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(tax_type='VAT', tax_percentage='10.00')
+        customer = create_user('benchcustomer')
+        vendors = [create_vendor(f'benchvendor{i}') for i in range(5)]
+        get_tax_rules()
+        for size in (1, 10, 100, 500):
+            Cart.objects.filter(user=customer).delete()
+            foods = [create_food(vendors[i % 5], f'Item {size}-{i}', '4.25') for i in range(size)]
+            Cart.objects.bulk_create([Cart(user=customer, fooditem=food, quantity=2) for food in foods])
+            start = time.perf_counter()
+            with self.assertNumQueries(1):
+                pricing = price_cart(customer)
+            print(f'\npricing {size} cart lines: {(time.perf_counter() - start) * 1000:.2f} ms')
+            self.assertEqual(pricing.subtotal, Decimal('8.50') * size)
+
+
+@tag('benchmark')
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class VendorOrderInboxBenchmark(TestCase):
+
+    def test_deep_pages_cost_the_same(self):
+        vendor = create_vendor('bigvendor')
+        customer = create_user('bigcustomer')
+        size = 100000
+        orders = Order.objects.bulk_create([
+            Order(user=customer, order_number=f'BIG{i}', first_name='A', last_name='B', email='a@example.com',
+                  address='Road 1', city='Dhaka', pin_code='1200', total=11.0, total_tax=1.0,
+                  payment_method='PayPal', is_ordered=True, status='Completed' if i % 10 else 'New')
+            for i in range(size)
+        ], batch_size=5000)
+        VendorOrder.objects.bulk_create([
+            VendorOrder(order=order, vendor=vendor, subtotal='10.00', tax='1.00', grand_total='11.00', status=order.status)
+            for order in orders
+        ], batch_size=5000)
+
+        for status in (None, 'New'):
+            cursor = None
+            timings = []
+            for _ in range(50):
+                start = time.perf_counter()
+                page = vendor_order_inbox(vendor, status=status, cursor=cursor)
+                timings.append((time.perf_counter() - start) * 1000)
+                cursor = page.next_cursor
+            print(f'\ninbox {size} orders status={status}: first page {timings[0]:.2f} ms, page 50 {timings[-1]:.2f} ms')
@@ -1,36 +1,145 @@
 import datetime
-import simplejson as json
+import threading
 
+from django.db import connection, transaction
+from django.db.models import F, FloatField, OuterRef, Prefetch, Subquery, Sum
 
-def generate_order_number(pk):
-    current_datetime = datetime.datetime.now().strftime('%Y%m%d%H%M%S') #20220616233810 + pk
-    order_number = current_datetime + str(pk)
-    return order_number
+from marketplace.utils import keyset_paginate
+from .models import Order, OrderedFood, OrderSequence, VendorOrder
+
+
+ORDER_NUMBER_BLOCK_SIZE = 20
+VENDOR_ORDERS_PAGE_SIZE = 20
+CUSTOMER_ORDERS_PAGE_SIZE = 20
+
+
+class OrderNumberAllocator:
+    """
+    Hands out values of an OrderSequence counter.
+
+    Each process reserves a block of values with one UPDATE and serves
+    numbers from memory until the block runs out, so concurrent workers
+    never collide and most orders need no extra query. Inside a caller's
+    transaction only a single value is reserved, and not kept: a rollback
+    undoes the reservation, and a kept block could then be handed to
+    another worker as well.
+    """
+
+    def __init__(self, name, block_size=ORDER_NUMBER_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next_value = 0
+        self.end = 0
+
+    def reserve_block(self, size=None):
+        size = size or self.block_size
+        with transaction.atomic():
+            updated = OrderSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size)
+            if not updated:
+                OrderSequence.objects.get_or_create(name=self.name)
+                OrderSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size)
+            # the UPDATE holds the row lock, so this reads our own increment
+            end = OrderSequence.objects.values_list('next_value', flat=True).get(name=self.name)
+        return end - size, end
+
+    def allocate(self):
+        with self.lock:
+            if self.next_value >= self.end:
+                if connection.in_atomic_block:
+                    return self.reserve_block(1)[0]
+                self.next_value, self.end = self.reserve_block()
+            value = self.next_value
+            self.next_value += 1
+            return value
+
+    def reset(self):
+        with self.lock:
+            self.next_value = self.end = 0
+
+
+order_numbers = OrderNumberAllocator('order')
+
+
+def generate_order_number():
+    current_datetime = datetime.datetime.now().strftime('%Y%m%d%H%M%S') #20220616233810 + sequence number
+    return current_datetime + str(order_numbers.allocate())
+
+
+NO_TOTALS = {'subtotal': 0, 'tax_dict': {}, 'grand_total': 0}
 
 
 def order_total_by_vendor(order, vendor_id):
-    total_data = json.loads(order.total_data)
-    data = total_data.get(str(vendor_id))
-    subtotal = 0
-    tax = 0
-    tax_dict = {}
-
-    for key, val in data.items():
-        subtotal += float(key)
-        val = val.replace("'", '"')
-        val = json.loads(val)
-        tax_dict.update(val)
-
-        # calculate tax
-        # {'CGST': {'9.00': '6.03'}, 'SGST': {'7.00': '4.69'}}
-        for i in val:
-            for j in val[i]:
-                tax += float(val[i][j])
-    grand_total = float(subtotal) + float(tax)
-    context = {
-        'subtotal': subtotal,
-        'tax_dict': tax_dict, 
-        'grand_total': grand_total,
-    }
-
-    return context
\ No newline at end of file
+    vendor_order = VendorOrder.objects.filter(order=order, vendor_id=vendor_id).first()
+    if vendor_order is None:
+        return NO_TOTALS
+    return vendor_order.totals()
+
+
+def group_by_vendor(ordered_food):
+    """``{vendor: [ordered food, ...]}`` for lines loaded with their food item's vendor."""
+    groups = {}
+    for item in ordered_food:
+        groups.setdefault(item.fooditem.vendor, []).append(item)
+    return groups
+
+
+def vendor_notification_contexts(order, ordered_food):
+    """
+    One "new order received" email context per vendor on the order.
+
+    ``ordered_food`` must come with ``fooditem__vendor__user`` loaded; the
+    vendor totals for the whole order are read in one query.
+    """
+    vendor_totals = {vendor_order.vendor_id: vendor_order.totals() for vendor_order in VendorOrder.objects.filter(order=order)}
+    contexts = []
+    for vendor, ordered_food_to_vendor in group_by_vendor(ordered_food).items():
+        totals = vendor_totals.get(vendor.id, NO_TOTALS)
+        contexts.append({
+            'order': order,
+            'to_email': vendor.user.email,
+            'ordered_food_to_vendor': ordered_food_to_vendor,
+            'vendor_subtotal': totals['subtotal'],
+            'tax_data': totals['tax_dict'],
+            'vendor_grand_total': totals['grand_total'],
+        })
+    return contexts
+
+
+def vendor_order_inbox(vendor, status=None, cursor=None, page_size=VENDOR_ORDERS_PAGE_SIZE):
+    """
+    One page of ``vendor``'s paid orders, newest first, optionally only
+    those with ``status``.
+
+    Rows are the vendor's VendorOrder shares, so the totals come with them
+    and the page is a range scan of the (vendor, [status,] created_at)
+    index however many orders the vendor has had.
+    """
+    queryset = VendorOrder.objects.filter(vendor=vendor, order__is_ordered=True).select_related('order')
+    if status:
+        queryset = queryset.filter(status=status)
+    return keyset_paginate(queryset, cursor=cursor, page_size=page_size, descending=True)
+
+
+def with_subtotal(queryset):
+    # sum of each order's lines, computed by the database per returned row
+    lines = (
+        OrderedFood.objects.filter(order=OuterRef('pk'))
+        .order_by().values('order').annotate(total=Sum('amount')).values('total')
+    )
+    return queryset.annotate(subtotal=Subquery(lines, output_field=FloatField()))
+
+
+def customer_orders(user):
+    """``user``'s paid orders with their subtotal and lines, for the order history."""
+    return with_subtotal(Order.objects.filter(user=user, is_ordered=True)).prefetch_related(
+        Prefetch('orderedfood_set', queryset=OrderedFood.objects.select_related('fooditem').order_by('id'))
+    )
+
+
+def customer_order_history(user, cursor=None, page_size=CUSTOMER_ORDERS_PAGE_SIZE):
+    """
+    One page of ``user``'s paid orders, newest first: a range scan of the
+    (user, is_ordered, created_at) index plus one query for the lines.
+    """
+    return keyset_paginate(customer_orders(user), cursor=cursor, page_size=page_size, descending=True)
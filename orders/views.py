@@ -1,14 +1,14 @@
 from urllib import response
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
-from marketplace.models import Cart, Tax
-from marketplace.context_processors import get_cart_amounts
-from menu.models import FoodItem
+from marketplace.models import Cart
 from .forms import OrderForm
-from .models import Order, OrderedFood, Payment
+from .checkout import capture_payment
+from .models import Order, OrderedFood, Payment, VendorOrder
+from .pricing import price_cart
 import simplejson as json
-from .utils import generate_order_number, order_total_by_vendor
-from accounts.utils import send_notification
+from .utils import generate_order_number, vendor_notification_contexts
+from accounts.utils import send_notification, send_notifications
 from django.contrib.auth.decorators import login_required
 import razorpay
 from foodOnline_main.settings import RZP_KEY_ID, RZP_KEY_SECRET
@@ -22,49 +22,16 @@ client = razorpay.Client(auth=(RZP_KEY_ID, RZP_KEY_SECRET))
 
 @login_required(login_url='login')
 def place_order(request):
-    cart_items = Cart.objects.filter(user=request.user).order_by('created_at')
-    cart_count = cart_items.count()
-    if cart_count <= 0:
+    # one query for the cart lines; totals and per-vendor tax in one pass
+    pricing = price_cart(request.user)
+    if not pricing:
         return redirect('marketplace')
 
-    vendors_ids = []
-    for i in cart_items:
-        if i.fooditem.vendor.id not in vendors_ids:
-            vendors_ids.append(i.fooditem.vendor.id)
-    
-    # {"vendor_id":{"subtotal":{"tax_type": {"tax_percentage": "tax_amount"}}}}
-    get_tax = Tax.objects.filter(is_active=True)
-    subtotal = 0
-    total_data = {}
-    k = {}
-    for i in cart_items:
-        fooditem = FoodItem.objects.get(pk=i.fooditem.id, vendor_id__in=vendors_ids)
-        v_id = fooditem.vendor.id
-        if v_id in k:
-            subtotal = k[v_id]
-            subtotal += (fooditem.price * i.quantity)
-            k[v_id] = subtotal
-        else:
-            subtotal = (fooditem.price * i.quantity)
-            k[v_id] = subtotal
-    
-        # Calculate the tax_data
-        tax_dict = {}
-        for i in get_tax:
-            tax_type = i.tax_type
-            tax_percentage = i.tax_percentage
-            tax_amount = round((tax_percentage * subtotal)/100, 2)
-            tax_dict.update({tax_type: {str(tax_percentage) : str(tax_amount)}})
-        # Construct total data
-        total_data.update({fooditem.vendor.id: {str(subtotal): str(tax_dict)}})
-    
-
-        
-
-    subtotal = get_cart_amounts(request)['subtotal']
-    total_tax = get_cart_amounts(request)['tax']
-    grand_total = get_cart_amounts(request)['grand_total']
-    tax_data = get_cart_amounts(request)['tax_dict']
+    vendors_ids = pricing.vendor_ids
+    subtotal = pricing.subtotal
+    total_tax = pricing.tax
+    grand_total = pricing.grand_total
+    tax_data = pricing.tax_dict
     
     if request.method == 'POST':
         form = OrderForm(request.POST)
@@ -82,13 +49,12 @@ def place_order(request):
             order.user = request.user
             order.total = grand_total
             order.tax_data = json.dumps(tax_data)
-            order.total_data = json.dumps(total_data)
             order.total_tax = total_tax
             order.payment_method = request.POST['payment_method']
-            order.save() # order id/ pk is generated
-            order.order_number = generate_order_number(order.id)
-            order.vendors.add(*vendors_ids)
+            order.order_number = generate_order_number()
             order.save()
+            order.vendors.add(*vendors_ids)
+            VendorOrder.objects.bulk_create(pricing.vendor_orders(order))
 
             # # RazorPay Payment
             # DATA = {
@@ -112,6 +78,15 @@ def place_order(request):
             # }
             # return render(request, 'orders/place_order.html', context)
 
+            context = {
+                'order': order,
+                'cart_items': pricing.lines,
+                'subtotal': subtotal,
+                'tax_dict': tax_data,
+                'grand_total': grand_total,
+            }
+            return render(request, 'orders/place_order.html', context)
+
         else:
             print(form.errors)
     return render(request, 'orders/place_order.html')
@@ -127,85 +102,41 @@ def payments(request):
         payment_method = request.POST.get('payment_method')
         status = request.POST.get('status')
 
-        order = Order.objects.get(user=request.user, order_number=order_number)
-        payment = Payment(
-            user = request.user,
-            transaction_id = transaction_id,
-            payment_method = payment_method,
-            amount = order.total,
-            status = status
+        def send_order_emails(order, payment, ordered_food):
+            # SEND ORDER CONFIRMATION EMAIL TO THE CUSTOMER
+            mail_subject = 'Thank you for ordering with us.'
+            mail_template = 'orders/order_confirmation_email.html'
+
+            customer_subtotal = 0
+            for item in ordered_food:
+                customer_subtotal += (item.price * item.quantity)
+            tax_data = json.loads(order.tax_data)
+            context = {
+                'user': request.user,
+                'order': order,
+                'to_email': order.email,
+                'ordered_food': ordered_food,
+                'domain': get_current_site(request),
+                'customer_subtotal': customer_subtotal,
+                'tax_data': tax_data,
+            }
+            send_notification(mail_subject, mail_template, context)
+
+            # SEND ORDER RECEIVED EMAIL TO THE VENDOR
+            mail_subject = 'You have received a new order.'
+            mail_template = 'orders/new_order_received.html'
+            contexts = vendor_notification_contexts(order, ordered_food)
+            send_notifications(mail_subject, mail_template, contexts)
+
+        # PAYMENT, ORDER UPDATE, ORDERED FOOD, CART CLEARING AND THE QUEUED EMAILS IN
+        # ONE TRANSACTION, ONCE PER IDEMPOTENCY KEY; A RETRIED CAPTURE GETS THE
+        # STORED RESPONSE BACK
+        response, _ = capture_payment(
+            request.user, order_number, transaction_id, payment_method, status,
+            key=request.headers.get('Idempotency-Key'), on_capture=send_order_emails,
         )
-        payment.save()
-
-        # UPDATE THE ORDER MODEL
-        order.payment = payment
-        order.is_ordered = True
-        order.save()
-
-        # MOVE THE CART ITEMS TO ORDERED FOOD MODEL
-        cart_items = Cart.objects.filter(user=request.user)
-        for item in cart_items:
-            ordered_food = OrderedFood()
-            ordered_food.order = order
-            ordered_food.payment = payment
-            ordered_food.user = request.user
-            ordered_food.fooditem = item.fooditem
-            ordered_food.quantity = item.quantity
-            ordered_food.price = item.fooditem.price
-            ordered_food.amount = item.fooditem.price * item.quantity # total amount
-            ordered_food.save()
-
-        # SEND ORDER CONFIRMATION EMAIL TO THE CUSTOMER
-        mail_subject = 'Thank you for ordering with us.'
-        mail_template = 'orders/order_confirmation_email.html'
-
-        ordered_food = OrderedFood.objects.filter(order=order)
-        customer_subtotal = 0
-        for item in ordered_food:
-            customer_subtotal += (item.price * item.quantity)
-        tax_data = json.loads(order.tax_data)
-        context = {
-            'user': request.user,
-            'order': order,
-            'to_email': order.email,
-            'ordered_food': ordered_food,
-            'domain': get_current_site(request),
-            'customer_subtotal': customer_subtotal,
-            'tax_data': tax_data,
-        }
-        send_notification(mail_subject, mail_template, context)
-        
-
-        # SEND ORDER RECEIVED EMAIL TO THE VENDOR
-        mail_subject = 'You have received a new order.'
-        mail_template = 'orders/new_order_received.html'
-        to_emails = []
-        for i in cart_items:
-            if i.fooditem.vendor.user.email not in to_emails:
-                to_emails.append(i.fooditem.vendor.user.email)
-
-                ordered_food_to_vendor = OrderedFood.objects.filter(order=order, fooditem__vendor=i.fooditem.vendor)
-                print(ordered_food_to_vendor)
-
-        
-                context = {
-                    'order': order,
-                    'to_email': i.fooditem.vendor.user.email,
-                    'ordered_food_to_vendor': ordered_food_to_vendor,
-                    'vendor_subtotal': order_total_by_vendor(order, i.fooditem.vendor.id)['subtotal'],
-                    'tax_data': order_total_by_vendor(order, i.fooditem.vendor.id)['tax_dict'],
-                    'vendor_grand_total': order_total_by_vendor(order, i.fooditem.vendor.id)['grand_total'],
-                }
-                send_notification(mail_subject, mail_template, context)
-
-        # CLEAR THE CART IF THE PAYMENT IS SUCCESS
-        # cart_items.delete() 
 
         # RETURN BACK TO AJAX WITH THE STATUS SUCCESS OR FAILURE
-        response = {
-            'order_number': order_number,
-            'transaction_id': transaction_id,
-        }
         return JsonResponse(response)
     return HttpResponse('Payments view')
 